@@ -1,32 +1,28 @@
-import pandas as pd
+import argparse
 import re
+import time
+import numpy as np
+import pandas as pd
+from name_index import NameIndex, normalize_name
+
+# Estimated price of each phone model, keyed by a distinctive part of the carrier's model name (e.g. 'S20 FE')
+# Edit phone_prices.csv to add models or change prices
+PRICE_TABLE_PATH = 'phone_prices.csv'
+
+
+# Load the price table into a {model key: price} hashmap
+def load_price_map(path=PRICE_TABLE_PATH):
+    prices = pd.read_csv(path, dtype={'Model': str})
+    return dict(zip(prices['Model'].str.upper().str.strip(), prices['Estimated Price']))
+
+
+# One regex for every key of the price map, compiled once
+# Keys are tried longest first, so at any position the most specific key wins ('S20 FE' over 'S20', '13 MINI' over '13')
+# and the result no longer depends on the order of the price table
+def compile_price_pattern(price_map):
+    keys = sorted(price_map, key=lambda key: (-len(key), key))
+    return re.compile(r'\b(' + '|'.join(re.escape(key) for key in keys) + r')\b')
 
-# Define a hashmap with estimated prices
-price_map = {
-    'S20 FE': 300,
-    'S21 FE': 400,
-    'S20 PLUS': 450,
-    'S20': 350,
-    '13 MINI': 650,
-    '14': 800,
-    '13': 700,
-    '12': 600,
-    'XR': 400,
-    '6S': 200,
-    'A54': 250,
-    'JETPACK MIFI 8800L': 100,
-    'XCOVER PRO': 350
-}
-
-# Function to estimate price based on equipment model
-def estimate_price(model):
-    model_upper = model.upper()
-    for key in price_map:
-        # Adjust pattern to find key components of the model names
-        pattern = re.compile(r'\b' + re.escape(key) + r'\b')
-        if pattern.search(model_upper):
-            return price_map[key]
-    return 0  # Return 0 if no match is found
 
 # Function to preprocess the model names to capture additional variations
 def preprocess_model(model):
@@ -34,21 +30,45 @@ def preprocess_model(model):
     model = model.replace('GS', 'S').strip()
     return model
 
-# Load the dataset
-file_path = 'confidential/Merged_HH_Phone_Inventory_Plan.csv'
-data = pd.read_csv(file_path)
 
-# Preprocess the 'Equipment Model' column
-data['Preprocessed Model'] = data['Equipment Model'].apply(preprocess_model)
+# Function to estimate price based on equipment model: the first (leftmost) key found in the model name, 0 if none
+def estimate_price(model, price_map, pattern):
+    match = pattern.search(preprocess_model(model).upper())
+    return price_map[match.group(1)] if match else 0
+
+
+# Estimated price of every row. Each distinct model is matched once and the prices are joined back to the rows by position.
+# With a NameIndex, a model that matches no key is tried again normalized ('iPhone-13' as 'IPHONE 13'), then as its
+# canonical product (an odd spelling of a model whose usual spelling does match)
+def estimate_prices(models, price_map, pattern=None, index=None):
+    pattern = pattern or compile_price_pattern(price_map)
+    codes, unique_models = pd.factorize(models)
+    unique_prices = [estimate_price(str(model), price_map, pattern) for model in unique_models]
+    if index is not None:
+        for i, model in enumerate(unique_models):
+            for name in (normalize_name(str(model)), index.canonical.get(str(model).strip())):
+                if unique_prices[i] == 0 and name:
+                    unique_prices[i] = estimate_price(name, price_map, pattern)
+    unique_prices = np.array(unique_prices + [0])
+    return pd.Series(unique_prices[codes], index=models.index)  # code -1 (missing model) picks the trailing 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Add an estimated price to every phone of the merged inventory")
+    parser.add_argument('--input', default='confidential/Merged_HH_Phone_Inventory_Plan.csv')
+    parser.add_argument('--output', default='confidential/AllPhoneInfo.csv')
+    parser.add_argument('--prices', default=PRICE_TABLE_PATH, help="CSV file with Model and Estimated Price columns")
+    args = parser.parse_args()
 
-# Add a new column for estimated prices
-data['Estimated Price'] = data['Preprocessed Model'].apply(estimate_price)
+    # Load the dataset
+    data = pd.read_csv(args.input)
 
-# Drop the 'Preprocessed Model' column as it's no longer needed
-data.drop(columns=['Preprocessed Model'], inplace=True)
+    # Add a new column for estimated prices
+    start = time.perf_counter()
+    price_map = load_price_map(args.prices)
+    data['Estimated Price'] = estimate_prices(data['Equipment Model'], price_map, index=NameIndex(data['Equipment Model']))
+    print(f"Priced {len(data)} phones ({data['Equipment Model'].nunique()} distinct models) in {time.perf_counter() - start:.2f} s")
 
-# Save the updated data back to a new CSV file
-output_file_path = 'confidential/AllPhoneInfo.csv' 
-data.to_csv(output_file_path, index=False)
+    # Save the updated data back to a new CSV file
+    data.to_csv(args.output, index=False)
 
-print(f"Data with estimated prices saved to {output_file_path}")
+    print(f"Data with estimated prices saved to {args.output}")
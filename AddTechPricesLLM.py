@@ -1,48 +1,141 @@
-import pandas as pd
+import argparse
+import json
+import multiprocessing
+import os
 import re
-from transformers import pipeline
-# Very unreliable way to get prices of inventory (Running GPT-2 model locally). 
+import time
+import pandas as pd
+from name_index import normalize_name
+# Very unreliable way to get prices of inventory (Running GPT-2 model locally).
 # GPT-2, an LLM that focuses on text and not so much numerics struggles here and does not have access to real time data. But, it is free.
 # Do not use for anything remotely important - for experimentation only.
 
+# Prices already generated are kept on disk, keyed by the model name normalized by name_index.normalize_name
+# ('Apple iPhone 13 128 GB' and 'APPLE IPHONE 13 128GB' are priced once) and the prompt version, so a run only asks the model about models it has never priced. Bump PROMPT_VERSION whenever PROMPT changes.
+PROMPT_VERSION = 1
+PROMPT = ("The price of a {model_name} in USD is what? Please only return the price in US dollars. "
+          "I would expect these phones to be anywhere from 100 to 1400 USD. iPhones are probably roughly 500-800. "
+          "Samsung S20s-S22s are probably similar too. Do not return a value less than 100.")
+CACHE_PATH = 'llm_price_cache.json'
+BATCH_SIZE = 8  # prompts per padded generator call
+
+generator = None  # one per process, loaded on first use
+
+
 # Initialize the model
-generator = pipeline('text-generation', model='gpt2')
-
-# Function to get the estimated price from GPT-2
-def get_price_from_llm(model_name):
-    prompt = f"The price of a {model_name} in USD is what? Please only return the price in US dollars. I would expect these phones to be anywhere from 100 to 1400 USD. iPhones are probably roughly 500-800. Samsung S20s-S22s are probably similar too. Do not return a value less than 100."
-    #prompt = "Say exactly the following back to me and nothing else: 117"
-    response = generator(prompt, max_new_tokens=30, num_return_sequences=1, truncation=True)
-    try:
-        # Extract the price from the response
-        price_text = response[0]['generated_text']
-        price = float(re.findall(r'\d+', price_text)[0]) # Take the first numerical value found.
-    except Exception as e:
-        print(f"Error parsing response for model {model_name}: {e}")
-        price = 0  # Default to 0 if extraction fails
-    return price
-
-# Load the dataset
-file_path = 'confidential/Merged_HH_Phone_Inventory_Plan.csv'  
-data = pd.read_csv(file_path)
-
-# Get unique models to reduce LLM calls
-unique_models = data['Equipment Model'].unique()
-
-# Create a price map by calling the LLM for each unique model
-price_map = {}
-for model in unique_models:
-    price_map[model] = get_price_from_llm(model)
-
-# Function to estimate price based on equipment model using the price map
-def estimate_price(model):
-    return price_map.get(model, 0)
-
-# Add a new column for estimated prices
-data['Estimated Price'] = data['Equipment Model'].apply(estimate_price)
-
-# Save the updated data back to a new CSV file
-output_file_path = 'confidential/AllPhoneInfo.csv'
-data.to_csv(output_file_path, index=False)
-
-print(f"Data with estimated prices saved to {output_file_path}")
+# GPT-2 has no padding token; batching needs one, and left padding so every prompt ends right where generation starts
+def load_generator(threads=None):
+    global generator
+    if generator is None:
+        import torch
+        from transformers import pipeline
+        if threads:
+            torch.set_num_threads(threads)
+        generator = pipeline('text-generation', model='gpt2')
+        generator.tokenizer.pad_token_id = generator.model.config.eos_token_id
+        generator.tokenizer.padding_side = 'left'
+    return generator
+
+
+# First number in the generated text (the prompt itself is not returned, so its own numbers can't be picked up)
+# None if there is no number, so the failure is not cached
+def parse_price(generated_text):
+    numbers = re.findall(r'\d+', generated_text)
+    return float(numbers[0]) if numbers else None
+
+
+# Prices of a list of models, BATCH_SIZE prompts per generator call
+def generate_prices(model_names, batch_size=BATCH_SIZE, threads=None):
+    generate = load_generator(threads)
+    prompts = [PROMPT.format(model_name=model_name) for model_name in model_names]
+    responses = generate(prompts, batch_size=batch_size, max_new_tokens=30, num_return_sequences=1,
+                         truncation=True, return_full_text=False, pad_token_id=generate.tokenizer.pad_token_id)
+    return [parse_price(response[0]['generated_text']) for response in responses]
+
+
+def generate_shard(args):
+    model_names, batch_size, threads = args
+    return generate_prices(model_names, batch_size, threads)
+
+
+# Spread the models over `workers` processes, each with its own copy of the model and an equal share of the CPU threads
+def generate_prices_parallel(model_names, workers=1, batch_size=BATCH_SIZE):
+    if workers <= 1 or len(model_names) <= batch_size:
+        return generate_prices(model_names, batch_size)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    shards = [model_names[i::workers] for i in range(workers)]
+    with multiprocessing.get_context('spawn').Pool(workers) as pool:
+        results = pool.map(generate_shard, [(shard, batch_size, threads) for shard in shards])
+    prices = [None] * len(model_names)
+    for i, shard_prices in enumerate(results):
+        prices[i::workers] = shard_prices
+    return prices
+
+
+# {"<prompt version>|<normalized model>": price} on disk
+class PriceCache:
+    def __init__(self, path=CACHE_PATH, prompt_version=PROMPT_VERSION):
+        self.path = path
+        self.prompt_version = prompt_version
+        try:
+            with open(path) as f:
+                self.prices = json.load(f)
+        except (OSError, ValueError):
+            self.prices = {}
+
+    def key(self, normalized_model):
+        return f"{self.prompt_version}|{normalized_model}"
+
+    def get(self, normalized_model):
+        return self.prices.get(self.key(normalized_model))
+
+    def update(self, prices):
+        self.prices.update({self.key(model): price for model, price in prices.items()})
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.prices, f, indent=1, sort_keys=True)
+        os.replace(self.path + '.tmp', self.path)
+
+
+# Estimated price of every row: distinct normalized models are looked up in the cache, the rest are generated
+# (blank models are priced 0 without asking, and so are models whose answer held no price, until a later run asks again)
+# Returns the prices and a small report of what the run did
+def estimate_prices(models, cache, workers=1, batch_size=BATCH_SIZE):
+    normalized = models.map(normalize_name).where(models.notna())  # read_csv gives NaN for blank cells, not 'NAN'
+    codes, unique_models = pd.factorize(normalized)
+    missing = [model for model in unique_models if model and cache.get(model) is None]
+    start = time.perf_counter()
+    generated = dict(zip(missing, generate_prices_parallel(missing, workers, batch_size))) if missing else {}
+    parsed = {model: price for model, price in generated.items() if price is not None}
+    if parsed:
+        cache.update(parsed)
+    elapsed = time.perf_counter() - start
+    unique_prices = pd.Series([cache.get(model) or 0 for model in unique_models] + [0])
+    report = {'rows': len(models), 'distinct models': len(unique_models), 'cached': len(unique_models) - len(missing),
+              'generated': len(missing), 'unparsed': len(generated) - len(parsed), 'seconds': elapsed,
+              'models per second': len(missing) / elapsed if missing and elapsed else None}
+    return pd.Series(unique_prices.to_numpy()[codes], index=models.index), report  # code -1 (missing model) picks the trailing 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Estimate phone prices with GPT-2 (experimental)")
+    parser.add_argument('--input', default='confidential/Merged_HH_Phone_Inventory_Plan.csv')
+    parser.add_argument('--output', default='confidential/AllPhoneInfo.csv')
+    parser.add_argument('--cache', default=CACHE_PATH)
+    parser.add_argument('--workers', type=int, default=1, help="processes, each running its own copy of the model")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    # Load the dataset
+    data = pd.read_csv(args.input)
+
+    # Add a new column for estimated prices
+    data['Estimated Price'], report = estimate_prices(data['Equipment Model'], PriceCache(args.cache), args.workers, args.batch_size)
+    print(f"{report['distinct models']} distinct models: {report['cached']} from the cache, {report['generated']} generated "
+          f"in {report['seconds']:.1f} s" + (f" ({report['models per second']:.2f} models/s, "
+                                              f"{1 / report['models per second']:.2f} s per model)" if report['generated'] else '')
+          + (f", {report['unparsed']} without a price (asked again next run)" if report['unparsed'] else ''))
+
+    # Save the updated data back to a new CSV file
+    data.to_csv(args.output, index=False)
+
+    print(f"Data with estimated prices saved to {args.output}")
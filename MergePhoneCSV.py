@@ -1,47 +1,102 @@
+import argparse
+import numpy as np
 import pandas as pd
 
+# Merge the Harvest Hope phone inventory with Verizon plan exports, one chunk of plan rows at a time
+# The inventory is small and is indexed on the phone number once; the plan exports (possibly several months or accounts)
+# are streamed and joined against that index chunk by chunk, keeping only each phone's latest bill, so memory is bounded
+# by the number of phones rather than the size of the exports.
+
 # Load the data from the CSV files
 hh_inventory_path = 'confidential/PhoneInventory.csv'
 vzw_mobile_plans_path = 'confidential/PhonePlans.csv'
+merged_file_path = 'confidential/Merged_HH_Phone_Inventory_Plan.csv'
 
-# Ensure that the Device ID column is read as a string to avoid scientific notation
-hh_inventory_df = pd.read_csv(hh_inventory_path, dtype={'Device ID': str})
-vzw_mobile_plans_df = pd.read_csv(vzw_mobile_plans_path, dtype={'Device ID': str})
+CHUNK_ROWS = 50_000  # plan rows read, joined and written at a time
 
-# Cleaning and preparing the HH Inventory dataframe
-hh_inventory_df.columns = hh_inventory_df.iloc[0]
-hh_inventory_df = hh_inventory_df[1:].reset_index(drop=True)
+# Selecting relevant columns for the final merged dataframe
+final_columns = [
+    'Number', 'Username', 'Equipment Model', 'Device ID', 'Location', 'Administration', 'Storage',
+    'Monthly Access Charges', 'Usage Charges', 'Equipment Charges',
+    'Surcharges and Other Charges and Credits', 'Taxes Governmental Surcharges and Fees',
+    'Third Party Charges (Includes Tax)', 'Total Charges'
+]
 
-# Cleaning and preparing the VZW Mobile Plans dataframe
-vzw_mobile_plans_df.columns = vzw_mobile_plans_df.iloc[4]
-vzw_mobile_plans_df = vzw_mobile_plans_df[5:].reset_index(drop=True)
 
-# Splitting the "Number / User Name" column to extract the phone number
-vzw_mobile_plans_df[['Number', 'User Name']] = vzw_mobile_plans_df['Number / User Name'].str.extract(r'(\d{3}-\d{3}-\d{4})\s*(.*)')
-vzw_mobile_plans_df['Number'] = vzw_mobile_plans_df['Number'].str.replace('-', '.')
+# Cleaning and preparing the HH Inventory dataframe: the real header is the second line of the export
+# Everything is read as text so phone numbers and Device IDs keep their exact digits (no scientific notation)
+def load_inventory(path=hh_inventory_path):
+    inventory = pd.read_csv(path, header=1, dtype=str)
+    # Renaming the column in HH Inventory to match VZW for merging, and indexing it for the join
+    # 'Inventory Row' remembers each phone's position, to tell which phones matched no plan row
+    inventory = inventory.rename(columns={'Mobile Number': 'Number'}).set_index('Number')
+    return inventory.assign(**{'Inventory Row': np.arange(len(inventory))})
 
-# Adding Administration Y/N based on the presence of "ADMIN" in the "Cost Center" column
-vzw_mobile_plans_df['Administration'] = vzw_mobile_plans_df.apply(
-    lambda row: 'Y' if 'ADMIN' in str(row['Cost Center']).upper() else 'N', axis=1
-)
 
-# Renaming the column in HH Inventory to match VZW for merging
-hh_inventory_df = hh_inventory_df.rename(columns={'Mobile Number': 'Number'})
+# Cleaning and preparing the VZW Mobile Plans export: five lines of account details come before the header
+def read_plans(path=vzw_mobile_plans_path, chunk_rows=CHUNK_ROWS):
+    return pd.read_csv(path, header=5, dtype=str, chunksize=chunk_rows)
 
-# Merging the dataframes on the phone number
-merged_df = pd.merge(hh_inventory_df, vzw_mobile_plans_df, on='Number', how='left')
 
-# Selecting relevant columns for the final merged dataframe
-final_columns = [
-    'Number', 'Username', 'Equipment Model', 'Device ID', 'Location', 'Administration', 'Storage',
-    'Monthly Access Charges', 'Usage Charges', 'Equipment Charges', 
-    'Surcharges and Other Charges and Credits', 'Taxes Governmental Surcharges and Fees', 
-    'Third Party Charges (Includes Tax)', 'Total Charges'
-]
-merged_df = merged_df[final_columns]
+# Vectorized per-chunk preparation of the plan rows
+def prepare_plans(plans):
+    # Splitting the "Number / User Name" column to extract the phone number
+    extracted = plans['Number / User Name'].str.extract(r'(\d{3}-\d{3}-\d{4})\s*(.*)')
+    # Adding Administration Y/N based on the presence of "ADMIN" in the "Cost Center" column
+    admin = plans['Cost Center'].fillna('').str.upper().str.contains('ADMIN', regex=False)
+    return plans.assign(**{'Number': extracted[0].str.replace('-', '.', regex=False), 'User Name': extracted[1],
+                           'Administration': np.where(admin, 'Y', 'N')})
 
-# Save the merged dataframe to a new CSV file without scientific notation
-merged_file_path = 'confidential/Merged_HH_Phone_Inventory_Plan.csv'
-merged_df.to_csv(merged_file_path, index=False, float_format='%.0f')
 
-print(f'Merged file saved to: {merged_file_path}')
+# Inner hash join of one chunk of plans against the indexed inventory (inventory columns first, as pd.merge would)
+def join_chunk(inventory, plans):
+    merged = inventory.join(plans.set_index('Number'), how='inner', lsuffix='_x', rsuffix='_y')
+    return merged.rename_axis('Number').reset_index()
+
+
+# Merged rows of one plan export, one joined chunk at a time (each row keeps the 'Inventory Row' it matched)
+def merge_chunks(inventory, plans_path, chunk_rows=CHUNK_ROWS):
+    for chunk in read_plans(plans_path, chunk_rows):
+        merged = join_chunk(inventory, prepare_plans(chunk))
+        if len(merged):
+            yield merged
+
+
+# One row per phone: its last merged row, given the merged frames oldest first
+def latest_bills(merged):
+    return pd.concat(merged).drop_duplicates('Inventory Row', keep='last')
+
+
+# Inventory phones that matched no plan row, with empty plan columns, as in a left join
+def unmatched_phones(inventory, matched):
+    return inventory[~matched].reset_index().reindex(columns=final_columns)
+
+
+# Stream every plan export (oldest first) through the join and save each phone's latest bill to output_path
+# Inventory phones that matched no plan row are written last. Returns the number of rows written.
+def merge_phone_csv(inventory_path=hh_inventory_path, plans_paths=(vzw_mobile_plans_path,),
+                    output_path=merged_file_path, chunk_rows=CHUNK_ROWS):
+    inventory = load_inventory(inventory_path)
+    latest = []
+    for plans_path in plans_paths:
+        for merged in merge_chunks(inventory, plans_path, chunk_rows):
+            latest = [latest_bills(latest + [merged])]
+    latest = latest[0].sort_values('Inventory Row') if latest else pd.DataFrame(columns=final_columns + ['Inventory Row'])
+    matched = np.zeros(len(inventory), dtype=bool)
+    matched[latest['Inventory Row'].to_numpy(dtype=np.intp)] = True
+    rows = pd.concat([latest[final_columns], unmatched_phones(inventory, matched)])
+    # Save the merged rows without scientific notation
+    rows.to_csv(output_path, index=False, float_format='%.0f')
+    return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge the phone inventory with one or more Verizon plan exports")
+    parser.add_argument('--inventory', default=hh_inventory_path)
+    parser.add_argument('--plans', nargs='+', default=[vzw_mobile_plans_path], help="plan exports, oldest first (e.g. one per month); each phone keeps its latest bill")
+    parser.add_argument('--output', default=merged_file_path)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    rows = merge_phone_csv(args.inventory, args.plans, args.output, args.chunk_rows)
+    print(f'Merged file saved to: {args.output} ({rows} rows)')
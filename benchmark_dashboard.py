@@ -0,0 +1,754 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import warnings
+from unittest import mock
+import gspread
+import numpy as np
+import pandas as pd
+from google.oauth2 import service_account
+from streamlit.testing.v1 import AppTest
+import sheets
+import dashboard_data
+import dashboard_tables
+import dashboard_exports
+import dashboard_sql
+import county_geometry
+import AddTechPrices
+import MergePhoneCSV
+import phone_pipeline
+import name_index
+import sheets_client
+from fake_gspread import FakeClient
+
+# Offline benchmarks for the Streamlit dashboard's data layer
+# Google Sheets is replaced by a local fake client that sleeps for a fixed latency on every request
+# Run with: python benchmark_dashboard.py [benchmark ...] [--sizes 1000 100000 1000000] [--output scaling.csv]
+
+LATENCY = 0.25  # seconds per simulated Sheets/Drive request
+ROWS = 200
+
+
+# Vocabularies of the synthetic worksheets, sized like Harvest Hope's real ones
+STATIC_INVENTORY = 'static/static.csv'  # the bundled TechInventory sample: item names, sections and comments
+COMBINED_SECTIONS = {  # Section -> Combined_Section, as in app.R
+    'Laptops': 'Laptops & Accessories', 'Laptop Chargers': 'Laptops & Accessories',
+    'Laptop Batteries': 'Laptops & Accessories', 'Laptop Accessories': 'Laptops & Accessories',
+    'Tablets': 'Tablets & Accessories', 'Tablet Chargers': 'Tablets & Accessories',
+    'Tablet Cases and Accessories': 'Tablets & Accessories',
+    'Phones': 'Phones & Accessories', 'Phone Cases': 'Phones & Accessories',
+    'Networking Equipment': 'Networking Equipment', 'Access Points': 'Networking Equipment',
+    'Storage Devices': 'Storage Devices', 'Printers and Scanners': 'Printers & Scanners',
+    'Audio and Video Equipment': 'Audio & Video Equipment', 'Cables and Adapters': 'Cables & Adapters',
+    'Computer Peripherals': 'Peripherals & Displays', 'Monitors': 'Peripherals & Displays', 'TVs': 'Peripherals & Displays',
+    'Miscellaneous Tech': 'Miscellaneous & Accessories', 'Other Accessories': 'Miscellaneous & Accessories',
+}
+LOCATIONS = ['Columbia', 'Charleston', 'Florence', 'Greenville', 'Spartanburg']  # warehouses, most staff in Columbia
+LOCATION_WEIGHTS = [0.5, 0.2, 0.15, 0.1, 0.05]
+PHONE_MODELS = {  # Verizon equipment model -> estimated price
+    'APPLE IPHONE 15 128GB': 800, 'APPLE IPHONE 14 128GB': 800, 'APPLE IPHONE 13 128GB': 700, 'APPLE IPHONE 13 MINI 128GB': 650,
+    'APPLE IPHONE 12 64GB': 600, 'APPLE IPHONE XR 64GB': 400, 'APPLE IPHONE 6S 32GB': 200, 'APPLE IPHONE SE 64GB': 300,
+    'SAMSUNG GALAXY S20 FE 5G': 300, 'SAMSUNG GALAXY S21 FE 5G': 400, 'SAMSUNG GALAXY S20 PLUS': 450, 'SAMSUNG GALAXY S20': 350,
+    'SAMSUNG GALAXY A54 5G': 250, 'SAMSUNG GALAXY XCOVER PRO': 350, 'VERIZON JETPACK MIFI 8800L': 100, 'ORBIC SPEED MIFI': 100,
+}
+DEVICES = ['Desktop', 'Monitor', 'Printer', 'Docking Station', 'Scanner', 'Keyboard', 'Mouse', 'Webcam', 'Headset',
+           'Label Printer', 'Barcode Scanner', 'Thin Client', 'UPS', 'Speaker', 'Projector']
+DEPARTMENTS = ['Operations', 'Finance', 'Development', 'Programs', 'IT', 'Human Resources', 'Marketing',
+               'Agency Relations', 'Warehouse', 'Transportation', 'Volunteer Services', 'Executive']
+
+
+def money(values):
+    return [f"${value:,.2f}" for value in values]
+
+
+# Build synthetic versions of the three worksheets (header row first, like the Sheets API returns them)
+# Item names, sections and comments are drawn from the bundled TechInventory sample, phone models from the
+# price list and locations with Harvest Hope's skew; numbers, usernames and device IDs are unique per phone.
+def synthetic_worksheets(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(STATIC_INVENTORY, keep_default_na=False)
+
+    picked = sample.iloc[rng.integers(0, len(sample), rows)]
+    copies = rng.integers(1, max(2, rows // len(sample)), rows)  # many rows per item at scale, e.g. 'Dell Latitude 5540 (12)'
+    items = [f"{item} ({copy})" if copy > 1 else item for item, copy in zip(picked['Item'], copies)]
+    tech = [['Item', 'Quantity', 'Comments', 'Section', 'Combined_Section', 'Estimated Price']]
+    tech += [list(row) for row in zip(items, rng.geometric(0.3, rows).tolist(), picked['Comments'], picked['Section'],
+                                      picked['Section'].map(COMBINED_SECTIONS).fillna('Miscellaneous & Accessories'),
+                                      money(rng.lognormal(4, 1.2, rows).round()))]
+
+    models = rng.choice(list(PHONE_MODELS), rows).tolist()
+    charges = rng.uniform(0, 1, (rows, 6)) * [40, 5, 30, 3, 6, 2]
+    phones = [['Number', 'Username', 'Equipment Model', 'Device ID', 'Location', 'Administration', 'Storage',
+               'Monthly Access Charges', 'Usage Charges', 'Equipment Charges', 'Surcharges and Other Charges and Credits',
+               'Taxes Governmental Surcharges and Fees', 'Third Party Charges (Includes Tax)', 'Total Charges', 'Estimated Price']]
+    phones += [list(row) for row in zip(
+        [f"{803 + i // 10**7}.{(i // 10**4) % 1000:03d}.{i % 10**4:04d}" for i in range(rows)],
+        [f"Employee {i}" if keep else '' for i, keep in enumerate(rng.random(rows) > 0.05)],  # a few spare lines
+        models, [str(10**14 + i * 7919) for i in range(rows)],
+        rng.choice(LOCATIONS, rows, p=LOCATION_WEIGHTS).tolist(), rng.choice(['Y', 'N'], rows, p=[0.2, 0.8]).tolist(),
+        rng.choice(['64GB', '128GB', '256GB'], rows, p=[0.3, 0.5, 0.2]).tolist(),
+        *[money(column) for column in charges.T], money(charges.sum(axis=1)),
+        [PHONE_MODELS[model] for model in models])]
+
+    stationary = [['Device', 'Department', 'Warehouse', 'Estimated Price']]
+    stationary += [list(row) for row in zip(rng.choice(DEVICES, rows).tolist(), rng.choice(DEPARTMENTS, rows).tolist(),
+                                            rng.choice(LOCATIONS, rows, p=LOCATION_WEIGHTS).tolist(), rng.integers(50, 2000, rows).tolist())]
+
+    return {'TechInventory': tech, 'FullPhones': phones, 'StationaryTech': stationary}
+
+
+# Time a function over fresh fake clients and report the best wall-clock time and the request count
+def time_loader(label, loader, worksheets, latency, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        client = FakeClient(worksheets, latency=latency)
+        start = time.perf_counter()
+        loader(client)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<40} {best:8.3f} s  {client.requests:3d} requests")
+    return best
+
+
+# The loading path the dashboard used before: one open + worksheet + get_all_records per worksheet, in a row
+def serial_load(client):
+    return {name: pd.DataFrame(client.open(sheets.SPREADSHEET_NAME).worksheet(name).get_all_records())
+            for name in sheets.WORKSHEETS}
+
+
+def bench_cold_start(rows=ROWS, latency=LATENCY):
+    print(f"Cold start: {len(sheets.WORKSHEETS)} worksheets x {rows} rows, {latency * 1000:.0f} ms per request")
+    worksheets = synthetic_worksheets(rows)
+    before = time_loader("serial load_data calls (before)", serial_load, worksheets, latency)
+    after = time_loader("batched load_worksheets (after)", sheets.load_worksheets, worksheets, latency)
+    print(f"speedup: {before / after:.1f}x")
+
+
+# Time to first content on a cold start (no data, no snapshot): the blocking batched load the page waited on (before)
+# vs the progressive load, one request per worksheet on worker threads, each worksheet usable as soon as it is processed (after)
+def bench_first_content(rows=20_000, latency=LATENCY, repeat=3):
+    print(f"First content: {len(sheets.WORKSHEETS)} worksheets x {rows} rows, {latency * 1000:.0f} ms per request, process_data on each")
+    worksheets = synthetic_worksheets(rows)
+    blocking, first, complete = float('inf'), float('inf'), float('inf')
+    for _ in range(repeat):
+        client = FakeClient(worksheets, latency=latency)
+        cache = sheets.WorksheetCache(client, process=dashboard_data.process_data)
+        start = time.perf_counter()
+        cache.get()
+        blocking = min(blocking, time.perf_counter() - start)
+        blocking_requests = client.requests
+
+        client = FakeClient(worksheets, latency=latency)
+        cache = sheets.WorksheetCache(client, process=dashboard_data.process_data)
+        start = time.perf_counter()
+        data = cache.get(wait=False)
+        while not data:
+            data = cache.wait(data)
+        first = min(first, time.perf_counter() - start)
+        while cache.loading:
+            data = cache.wait(data)
+        complete = min(complete, time.perf_counter() - start)
+        if cache.last_error is not None:
+            raise cache.last_error
+    print(f"{'blocking get() (before)':<40} {blocking:8.3f} s  {blocking_requests:3d} requests")
+    print(f"{'progressive: first worksheet (after)':<40} {first:8.3f} s")
+    print(f"{'progressive: every worksheet (after)':<40} {complete:8.3f} s  {client.requests:3d} requests")
+    print(f"first content: {blocking / first:.1f}x sooner")
+
+
+# A burst of sessions loading the worksheets against the Sheets quota, scaled down to `limit` requests per second,
+# with the first two requests failing with 503: the bare client (before) vs the QuotaClient (after)
+# Sessions arrive at random over `spread` seconds, each with its own batched load (open + values request)
+def bench_quota(sessions=40, limit=10, spread=2.0, latency=0.1):
+    print(f"Quota burst: {sessions} sessions over {spread:.0f} s, quota {limit} requests/s, {latency * 1000:.0f} ms per request, two 503s")
+    worksheets = synthetic_worksheets(ROWS)
+    rng = random.Random(0)
+    arrivals = sorted(rng.uniform(0, spread) for _ in range(sessions))
+
+    def burst(label, fake, client):
+        failed = []
+
+        def session(delay):
+            time.sleep(delay)
+            try:
+                sheets.load_worksheets(client)
+            except Exception as e:
+                failed.append(e)
+
+        threads = [threading.Thread(target=session, args=(delay,)) for delay in arrivals]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+        print(f"{label:<28} {sessions - len(failed):3d}/{sessions} sessions loaded in {seconds:5.2f} s, "
+              f"{fake.requests:3d} requests reached Sheets, {fake.rejected:3d} rejected")
+
+    fake = FakeClient(worksheets, latency=latency, failures=[503, 503], quota=(limit, 1.0))
+    burst("bare client (before)", fake, fake)
+    fake = FakeClient(worksheets, latency=latency, failures=[503, 503], quota=(limit, 1.0))
+    client = sheets_client.QuotaClient(fake, limit=limit, period=1.0, backoff=0.05, rng=random.Random(0))
+    burst("QuotaClient (after)", fake, client)
+    print("QuotaClient counters: " + ", ".join(f"{name} {value:g}" for name, value in sorted(client.counters.items())))
+
+
+# Sheets traffic for many sessions: one full batched load per session (before) vs the shared WorksheetCache (after)
+def bench_shared_refresh(sessions=50, rows=ROWS):
+    print(f"Shared refresh: {sessions} sessions, one worksheet edited, {sessions} more sessions")
+    worksheets = synthetic_worksheets(rows)
+
+    client = FakeClient(dict(worksheets))
+    for _ in range(2 * sessions):  # sessions opened before and after the edit
+        sheets.load_worksheets(client)
+    print(f"{'per-session loads (before)':<40} {client.requests:5d} requests")
+
+    now = [0.0]
+    processed = []
+    client = FakeClient(dict(worksheets))
+    cache = sheets.WorksheetCache(client, process=lambda data, worksheet_name: processed.append(data) or data, ttl=60, clock=lambda: now[0])
+    for _ in range(sessions):
+        cache.get()
+    client.update_worksheet('FullPhones', synthetic_worksheets(rows, seed=1)['FullPhones'])
+    now[0] += 60
+    for _ in range(sessions):
+        cache.get()
+    with cache.lock:  # wait for the background revalidation to finish
+        pass
+    print(f"{'shared WorksheetCache (after)':<40} {client.requests:5d} requests, {len(processed)} process_data calls")
+
+
+# process_data as it was before the schema-driven pipeline, kept as the baseline
+def process_data_before(data):
+    if 'RowID' in data.columns:
+        data = data.drop(columns=['RowID'])
+    if 'Total Charges' in data.columns:
+        data['Total Charges'] = pd.to_numeric(data['Total Charges'].replace(r'[\$,]', '', regex=True), errors='coerce')
+        data['Annual Phone Bill'] = data['Total Charges'] * 12
+    if 'Estimated Price' in data.columns:
+        data['Estimated Price'] = pd.to_numeric(data['Estimated Price'].replace(r'[\$,]', '', regex=True), errors='coerce')
+        if 'Quantity' in data.columns:
+            data['Total Value'] = data['Quantity'] * data['Estimated Price']
+    return data
+
+
+# Memory and speed of process_data and of a typical groupby, before and after the typed schema
+def bench_process_data(rows=100_000):
+    print(f"process_data: {rows} rows per worksheet")
+    for name, values in synthetic_worksheets(rows).items():
+        raw = sheets.values_to_dataframe([[str(value) for value in row] for row in values])
+        start = time.perf_counter()
+        before = process_data_before(raw.copy())
+        before_time = time.perf_counter() - start
+        start = time.perf_counter()
+        after = dashboard_data.process_data(raw.copy(), name)
+        after_time = time.perf_counter() - start
+        key = 'Section' if 'Section' in after.columns else 'Location' if 'Location' in after.columns else 'Device'
+        groupby_times = []
+        for data in (before, after):
+            start = time.perf_counter()
+            data.groupby(key, observed=True)['Estimated Price'].sum()
+            groupby_times.append(time.perf_counter() - start)
+        report = dashboard_data.memory_report(before, after)
+        print(f"  {name}: process {before_time:.3f} s -> {after_time:.3f} s, groupby('{key}') "
+              f"{groupby_times[0] * 1000:.1f} ms -> {groupby_times[1] * 1000:.1f} ms, "
+              f"memory {report.loc['Total', 'before'] / 1e6:.1f} MB -> {report.loc['Total', 'after'] / 1e6:.1f} MB")
+        print(report.drop(index='Total').to_string(), end='\n\n')
+
+
+# Workstation filter: chained boolean masks (before) vs the (category, value) index of TableSource (after)
+def bench_filters(rows=100_000, repeat=20):
+    print(f"Workstation filter: {rows} rows, Department AND Warehouse")
+    raw = sheets.values_to_dataframe([[str(value) for value in row] for row in synthetic_worksheets(rows)['StationaryTech']])
+    data = dashboard_data.process_data(raw, 'StationaryTech')
+    filters = {'Department': ['Finance', 'IT'], 'Warehouse': ['Columbia']}
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        mask = pd.Series(True, index=data.index)
+        for column, values in filters.items():
+            mask &= data[column].isin(values)
+        before = data[mask]
+    before_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    source = dashboard_tables.TableSource(data, tuple(filters))
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(repeat):
+        after = source.take(source.rows(filters))
+    after_time = (time.perf_counter() - start) / repeat
+    assert after.reset_index(drop=True).equals(before.reset_index(drop=True))
+    print(f"{'boolean masks (before)':<40} {before_time * 1000:8.2f} ms per query")
+    print(f"{'index intersection (after)':<40} {after_time * 1000:8.2f} ms per query (index built once in {build_time * 1000:.1f} ms)")
+
+
+# Peak Python memory of exporting a whole phone table: to_csv().encode() (before) vs chunked exports, written to a file and then read back by ExportCache.get as a download does (after)
+def bench_export(rows=100_000):
+    print(f"Export: {rows} phone rows")
+    raw = sheets.values_to_dataframe([[str(value) for value in row] for row in synthetic_worksheets(rows)['FullPhones']])
+    source = dashboard_tables.TableSource(dashboard_data.process_data(raw, 'FullPhones'))
+    all_rows = source.rows()
+
+    def measure(label, export):
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = export()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<40} {elapsed:6.2f} s  peak {peak / 1e6:7.1f} MB  file {size / 1e6:6.1f} MB")
+
+    measure("to_csv().encode() (before)", lambda: len(source.data.to_csv(index=False).encode('utf-8')))
+    with tempfile.TemporaryDirectory() as directory:
+        for export_format in dashboard_exports.EXPORT_FORMATS:
+            def export():
+                path = os.path.join(directory, 'export')
+                with open(path, 'wb') as f:
+                    dashboard_exports.write_export(source, all_rows, export_format, f)
+                return os.path.getsize(path)
+            measure(f"chunked {export_format}, file only", export)
+            # What a download costs: ExportCache.get writes the file, then reads it back whole for st.download_button
+            measure(f"chunked {export_format}, download (after)",
+                    lambda: len(dashboard_exports.ExportCache(directory).get('benchmark', source, all_rows, export_format)))
+
+
+# AddTechPrices on a large carrier export: one regex compiled per key per row, keys in table order (before)
+# vs the compiled longest-first pattern over the distinct models, joined back by position (after)
+def bench_price_matching(rows=100_000):
+    print(f"Phone price matching: {rows} rows")
+    models = pd.Series([row[2] for row in synthetic_worksheets(rows)['FullPhones'][1:]])
+    price_map = AddTechPrices.load_price_map()
+
+    def estimate_price_before(model):
+        model_upper = AddTechPrices.preprocess_model(model).upper()
+        for key in price_map:
+            if re.compile(r'\b' + re.escape(key) + r'\b').search(model_upper):
+                return price_map[key]
+        return 0
+
+    start = time.perf_counter()
+    before = models.map(estimate_price_before)
+    before_time = time.perf_counter() - start
+    start = time.perf_counter()
+    after = AddTechPrices.estimate_prices(models, price_map)
+    after_time = time.perf_counter() - start
+    assert (before.to_numpy() == after.to_numpy()).all()
+    print(f"{'per-row regex loop (before)':<40} {before_time:8.3f} s")
+    print(f"{'compiled pattern, unique models (after)':<40} {after_time:8.3f} s")
+
+
+# NameIndex over growing sets of distinct names: the bundled inventory items, phone models and device types, each
+# respelled many times (case, punctuation, spaced units, spec suffixes) and mixed with unrelated generated names
+def bench_name_index(sizes=(1_000, 10_000, 50_000), rows=1_000_000):
+    rng = np.random.default_rng(0)
+    products = list(pd.read_csv(STATIC_INVENTORY)['Item'].str.strip()) + list(PHONE_MODELS) + DEVICES
+    suffixes = ['', ' 64GB', ' 128 GB', ' Gen2', ' 5G', ' (refurb)', ' w/ charger']
+    words = [f"{a}{b}" for a in 'BCDFGKLMNPRST' for b in ['ax', 'el', 'ion', 'or', 'ux', 'ex']]
+    print(f"{'distinct names':>14} {'products':>9} {'build':>9} {'map ' + str(rows) + ' rows':>16}")
+    for size in sizes:
+        respelled = [(name.upper() if i % 3 == 0 else name.replace(' ', '-') if i % 3 == 1 else name) + suffixes[i % len(suffixes)]
+                     for i, name in enumerate(rng.choice(products, size // 2))]
+        generated = [' '.join(rng.choice(words, 3)) + f" {number}" for number in range(size - len(respelled))]
+        names = pd.Series(respelled + generated)
+        start = time.perf_counter()
+        index = name_index.NameIndex(names)
+        build_time = time.perf_counter() - start
+        sample = names.sample(rows, replace=True, random_state=0).reset_index(drop=True)
+        start = time.perf_counter()
+        index.map(sample)
+        print(f"{names.nunique():>14} {len(index):>9} {build_time:>8.3f}s {time.perf_counter() - start:>15.3f}s")
+
+
+# Inventory and Verizon plan exports laid out like the real ones: a title line before the inventory header,
+# five account lines before the plan header. Every phone has `months` plan rows (one per bill) plus some unknown numbers,
+# in one plan file or, with split=True, one file per month. Returns the inventory path and the list of plan paths.
+def write_phone_exports(directory, phones, months, split=False):
+    numbers = [f"803-{i // 10**4:03d}-{i % 10**4:04d}" for i in range(phones)]
+    with open(os.path.join(directory, 'inventory.csv'), 'w') as f:
+        f.write('Harvest Hope phone inventory,,,,,\n')
+        f.write('Mobile Number,Username,Equipment Model,Device ID,Location,Storage\n')
+        for i, number in enumerate(numbers):
+            f.write(f"{number.replace('-', '.')},Employee {i},{list(PHONE_MODELS)[i % len(PHONE_MODELS)]},"
+                    f"{10**14 + i * 7919},{LOCATIONS[i % len(LOCATIONS)]},128GB\n")
+    charges = ['Monthly Access Charges', 'Usage Charges', 'Equipment Charges', 'Surcharges and Other Charges and Credits',
+               'Taxes Governmental Surcharges and Fees', 'Third Party Charges (Includes Tax)', 'Total Charges']
+    padding = ',' * (len(charges) + 1)  # the export pads every line to the full width
+    plan_paths = []
+    for month in range(months):
+        path = os.path.join(directory, f"plans_{month + 1:02d}.csv" if split else 'plans.csv')
+        if path not in plan_paths:
+            plan_paths.append(path)
+            with open(path, 'w') as f:
+                f.write(''.join(f"{line}{padding}\n" for line in ['Verizon Wireless', 'Account 123456789', 'Invoice Monthly',
+                                                                 'Bill period', 'Usage charges by line']))
+                f.write(','.join(['Number / User Name', 'Cost Center'] + charges) + '\n')
+        with open(path, 'a') as f:
+            for i, number in enumerate(numbers + [f"999-000-{i:04d}" for i in range(phones // 50)]):
+                cost_center = 'HH-ADMIN' if i % 5 == 0 else 'HH-OPS'
+                f.write(f"{number} EMPLOYEE {i},{cost_center}," + ','.join([f"{12.5 + month:.2f}"] * len(charges)) + '\n')
+    return os.path.join(directory, 'inventory.csv'), plan_paths
+
+
+# MergePhoneCSV as it was: both files in memory, re-headered with iloc, row-wise apply for Administration
+def merge_phone_csv_before(inventory_path, plans_path, output_path):
+    hh_inventory_df = pd.read_csv(inventory_path, dtype={'Device ID': str})
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.DtypeWarning)  # it guessed column types per block of lines
+        vzw_mobile_plans_df = pd.read_csv(plans_path, dtype={'Device ID': str})
+    hh_inventory_df.columns = hh_inventory_df.iloc[0]
+    hh_inventory_df = hh_inventory_df[1:].reset_index(drop=True)
+    vzw_mobile_plans_df.columns = vzw_mobile_plans_df.iloc[4]
+    vzw_mobile_plans_df = vzw_mobile_plans_df[5:].reset_index(drop=True)
+    vzw_mobile_plans_df[['Number', 'User Name']] = vzw_mobile_plans_df['Number / User Name'].str.extract(r'(\d{3}-\d{3}-\d{4})\s*(.*)')
+    vzw_mobile_plans_df['Number'] = vzw_mobile_plans_df['Number'].str.replace('-', '.')
+    vzw_mobile_plans_df['Administration'] = vzw_mobile_plans_df.apply(
+        lambda row: 'Y' if 'ADMIN' in str(row['Cost Center']).upper() else 'N', axis=1)
+    hh_inventory_df = hh_inventory_df.rename(columns={'Mobile Number': 'Number'})
+    merged_df = pd.merge(hh_inventory_df, vzw_mobile_plans_df, on='Number', how='left')
+    merged_df[MergePhoneCSV.final_columns].to_csv(output_path, index=False, float_format='%.0f')
+    return len(merged_df)
+
+
+# Time and peak traced memory of merging a multi-month bill history, in memory (before) vs streamed in chunks, keeping each phone's latest bill (after)
+def bench_merge(phones=20_000, months=12):
+    print(f"MergePhoneCSV: {phones} phones, {months} monthly bills")
+    with tempfile.TemporaryDirectory() as directory:
+        inventory_path, (plans_path,) = write_phone_exports(directory, phones, months)
+        outputs = []
+        for label, merge in [("in memory, row-wise apply (before)", merge_phone_csv_before),
+                             ("streamed chunks, hash join (after)", lambda *paths: MergePhoneCSV.merge_phone_csv(paths[0], [paths[1]], paths[2]))]:
+            output_path = os.path.join(directory, f"merged_{len(outputs)}.csv")
+            result = measure_stage(label, phones * months, lambda: merge(inventory_path, plans_path, output_path))
+            outputs.append(pd.read_csv(output_path, dtype=str))
+        # The old merge wrote every bill; the new one keeps each phone's latest (the last of its rows)
+        outputs[0] = outputs[0].drop_duplicates('Number', keep='last')
+        # The old in-memory read guesses types per block of lines, so some charges come out as 12.5 instead of 12.50
+        charges = MergePhoneCSV.final_columns[7:]
+        normalize = lambda data: data.astype({column: float for column in charges}).sort_values(list(data.columns)).reset_index(drop=True)
+        assert normalize(outputs[0]).equals(normalize(outputs[1])), "merged rows differ"
+
+
+# The phone pipeline on a year of monthly bills: a first run, a re-run with nothing changed, and a re-run after
+# one charge on one bill changed, against a fake FullPhones worksheet (cells written counts what each push rewrote)
+def bench_pipeline(phones=20_000, months=12):
+    print(f"Phone pipeline: {phones} phones, {months} monthly bill files")
+    with tempfile.TemporaryDirectory() as directory:
+        inventory_path, plan_paths = write_phone_exports(directory, phones, months, split=True)
+        client = FakeClient({phone_pipeline.PHONE_WORKSHEET: []})
+        cache = phone_pipeline.StageCache(os.path.join(directory, 'cache'))
+
+        def run(label):
+            written = client.cells_written
+            start = time.perf_counter()
+            data, rows = phone_pipeline.run_pipeline(inventory_path, plan_paths, client=client, cache=cache)
+            print(f"{label:<40} {time.perf_counter() - start:8.3f} s  {rows} rows, {client.cells_written - written} cells pushed\n")
+
+        run("first run")
+        run("re-run, nothing changed")
+        with open(plan_paths[-1]) as f:
+            text = f.read()
+        with open(plan_paths[-1], 'w') as f:
+            f.write(text.replace(f"{12.5 + months - 1:.2f}", "99.99", 1))
+        run("re-run, one charge changed")
+
+
+# Time and peak traced memory of one stage. The stage runs twice: once timed, once under tracemalloc
+# (tracing slows Python code down a lot, so the two are never measured on the same run)
+def measure_stage(label, rows, stage):
+    start = time.perf_counter()
+    result = stage()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    stage()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:<34} {elapsed:8.3f} s  {rows / elapsed:12,.0f} rows/s  peak {peak / 1e6:8.1f} MB")
+    return {'stage': label, 'rows': rows, 'seconds': elapsed, 'rows_per_second': rows / elapsed, 'peak_bytes': peak}
+
+
+# Every data stage of the dashboard at each size, with each worksheet `rows` long:
+# fetch + parse from the fake client, process_data, the rollups (groupbys and prepare_data merges), prepare_data
+# on its own, anonymization, filtering (index build and query) and chunked exports of the whole phone table
+def bench_scaling(sizes=(1_000, 100_000, 1_000_000)):
+    results = []
+    for rows in sizes:
+        print(f"Scaling: {rows:,} rows per worksheet")
+        raw = synthetic_worksheets(rows)
+        total = sum(len(values) - 1 for values in raw.values())
+        client = FakeClient(raw)
+        stages = []
+
+        def stage(label, stage_rows, run):
+            stages.append(measure_stage(label, stage_rows, run))
+
+        stage("fetch + parse", total, lambda: sheets.load_worksheets(client))
+        frames = sheets.load_worksheets(client)
+        stage("process_data", total, lambda: {name: dashboard_data.process_data(data, name) for name, data in frames.items()})
+        data = {name: dashboard_data.process_data(frame, name) for name, frame in frames.items()}
+        del frames
+        all_counties_df = pd.DataFrame({'County': county_geometry.load_levels()['counties']})
+        stage("rollups (groupby + prepare_data)", total, lambda: dashboard_data.build_rollups(
+            data['TechInventory'], data['FullPhones'], data['StationaryTech'], all_counties_df))
+        stage("prepare_data (phones)", rows, lambda: dashboard_data.prepare_data(
+            data['FullPhones'], ['Annual Phone Bill', 'Estimated Price'], all_counties_df))
+        stage("anonymize (phones)", rows, lambda: dashboard_data.anonymize(data['FullPhones'], 'benchmark'))
+
+        filters = {'Department': ['Finance', 'IT'], 'Warehouse': ['Columbia']}
+        stage("filter index build (workstations)", rows,
+              lambda: dashboard_tables.TableSource(data['StationaryTech'], tuple(filters)))
+        source = dashboard_tables.TableSource(data['StationaryTech'], tuple(filters))
+        stage("filter query (workstations)", rows, lambda: source.take(source.rows(filters, sort_by='Estimated Price')))
+
+        phones = dashboard_tables.TableSource(data['FullPhones'])
+        with tempfile.TemporaryDirectory() as directory:
+            for export_format in ('CSV', 'Parquet'):
+                def export():
+                    with open(os.path.join(directory, 'export'), 'wb') as f:
+                        dashboard_exports.write_export(phones, phones.rows(), export_format, f)
+                stage(f"export {export_format} (phones)", rows, export)
+        results += [{'size': rows, **result} for result in stages]
+        print()
+    return pd.DataFrame(results)
+
+
+# The SQL engine (dashboard_sql.py) against the pandas path at each size: rollups with county joins, workstation filters
+# with a sort, and a CSV export of the filtered rows. Every SQL result is checked to be identical to the pandas one.
+def bench_sql(sizes=(1_000, 100_000, 1_000_000), repeat=5):
+    filters = {'Department': ['Finance', 'IT'], 'Warehouse': ['Columbia']}
+    all_counties_df = pd.DataFrame({'County': county_geometry.load_levels()['counties']})
+    for rows in sizes:
+        print(f"SQL engine vs pandas: {rows:,} rows per worksheet")
+        client = FakeClient(synthetic_worksheets(rows))
+        data = {name: dashboard_data.process_data(frame, name) for name, frame in sheets.load_worksheets(client).items()}
+
+        def best(run):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = run()
+                times.append(time.perf_counter() - start)
+            return min(times), result
+
+        load_time, engine = best(lambda: dashboard_sql.SqlEngine(data))
+        pandas_rollups_time, pandas_rollups = best(lambda: dashboard_data.build_rollups(
+            data['TechInventory'], data['FullPhones'], data['StationaryTech'], all_counties_df))
+        sql_rollups_time, sql_rollups = best(lambda: dashboard_sql.build_rollups(engine, all_counties_df))
+        for key, value in pandas_rollups.items():
+            if key == 'totals':
+                assert value == sql_rollups[key], key
+            else:
+                pd.testing.assert_frame_equal(value, sql_rollups[key], check_exact=True)
+
+        index_time, table = best(lambda: dashboard_tables.TableSource(data['StationaryTech'], tuple(filters)))
+        sql_table = dashboard_sql.SqlTableSource(engine, 'StationaryTech', data['StationaryTech'])
+        pandas_query_time, pandas_rows = best(lambda: table.rows(filters, sort_by='Estimated Price', ascending=False))
+        sql_query_time, sql_rows = best(lambda: sql_table.rows(filters, sort_by='Estimated Price', ascending=False))
+        assert (pandas_rows == sql_rows).all()
+
+        def export(source, rows):
+            f = io.BytesIO()
+            dashboard_exports.write_export(source, rows, 'CSV', f)
+            return f.getvalue()
+        pandas_export_time, pandas_export = best(lambda: export(table, table.rows(filters, sort_by='Estimated Price')))
+        sql_export_time, sql_export = best(lambda: export(sql_table, sql_table.rows(filters, sort_by='Estimated Price')))
+        assert pandas_export == sql_export
+
+        frames_bytes = sum(frame.memory_usage(deep=True).sum() for frame in data.values())
+        database_bytes = engine.query("SELECT SUM(memory_usage_bytes) AS size FROM duckdb_memory()")['size'].iloc[0]
+        print(f"  {'stage':<34} {'pandas':>10} {'sql':>10}")
+        print(f"  {'load (index build / database)':<34} {index_time:>9.3f}s {load_time:>9.3f}s")
+        print(f"  {'rollups + county joins':<34} {pandas_rollups_time:>9.3f}s {sql_rollups_time:>9.3f}s")
+        print(f"  {'filter + sort (workstations)':<34} {pandas_query_time:>9.3f}s {sql_query_time:>9.3f}s")
+        print(f"  {'filtered CSV export':<34} {pandas_export_time:>9.3f}s {sql_export_time:>9.3f}s")
+        print(f"  worksheets: {frames_bytes / 1e6:.1f} MB as DataFrames, {database_bytes / 1e6:.1f} MB in the database; results identical")
+        engine.close()
+        print()
+
+
+# Latency of widget interactions on the dashboard itself, run with Streamlit's AppTest against the fake client
+# Before: every widget reran the whole page. After: a widget reruns only the section (fragment) holding it.
+# AppTest always reruns the whole script, so the profiled 'section <name>' stage of each rerun stands in for the fragment rerun.
+INTERACTIONS = [  # (page, section, widget type, widget label, values to alternate between)
+    ('page_charts.py', 'storage charts', 'radio', "Select Chart Style for Storage Value by Category:", ['Pie Chart', 'Bar Chart']),
+    ('page_charts.py', 'workstation charts', 'radio', "Select Chart Style for Total Value by Device Type:", ['Pie Chart', 'Bar Chart']),
+    ('page_explore.py', 'phone table', 'selectbox', "Select Location:", [1, 0]),
+    ('page_explore.py', 'server table', 'selectbox', "Select Section:", [1, 0]),
+    ('page_explore.py', 'workstation table', 'multiselect', "Select filter categories:", [['Department'], []]),
+]
+
+
+def bench_interactions(rows=20_000, repeat=5):
+    print(f"Interactions: {len(sheets.WORKSHEETS)} worksheets x {rows} rows, high clearance, warm caches")
+    worksheets = synthetic_worksheets(rows)
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(gspread, 'authorize', lambda credentials: FakeClient(worksheets)), \
+            mock.patch.object(service_account.Credentials, 'from_service_account_info', lambda *args, **kwargs: None):
+        app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlitdashboard.py'), default_timeout=600)
+        app.secrets['clearance'] = {'low_level': hashlib.sha256(b'low').hexdigest(), 'high_level': hashlib.sha256(b'high').hexdigest()}
+        app.secrets['gcp_service_account'] = {}
+        app.secrets['snapshots'] = {'path': directory}
+        app.secrets['profiling'] = {'enabled': True}
+        app.session_state['authenticated'] = True
+        app.session_state['clearance_level'] = 'high'
+        app.run()
+
+        print(f"{'interaction':<22} {'page rerun (before)':>20} {'section rerun (after)':>22}")
+        for page_script, section, kind, label, values in INTERACTIONS:
+            if app.session_state['profile_history'][-1]['page'] != dashboard_page_title(page_script):
+                app.switch_page(page_script).run()
+                app.run()  # caches warm
+            page, part = [], []
+            for i in range(repeat):
+                widget = next(widget for widget in getattr(app, kind) if widget.label == label)
+                value = values[i % len(values)]
+                widget.set_value(widget.options[value] if isinstance(value, int) else value).run()
+                if app.exception:
+                    raise RuntimeError(app.exception[0].value)
+                record = app.session_state['profile_history'][-1]
+                page.append(record['total_ms'])
+                part.append(sum(stage['ms'] for stage in record['stages'] if stage['name'] == f'section {section}'))
+            print(f"{section:<22} {np.median(page):17.0f} ms {np.median(part):19.0f} ms   {np.median(page) / np.median(part):5.1f}x")
+
+
+def dashboard_page_title(page_script):
+    return {'page_charts.py': "Charts", 'page_explore.py': "Explore Data"}[page_script]
+
+
+# Cold start of the dashboard itself, each measurement in a fresh Python process:
+# - process startup: `streamlit run` until the server answers its health check
+# - time to the password prompt, with the imports the app made before drawing it (before) and with lazy pages (after)
+# - first open of each page after the password, with the modules it brought in (fake client, no network latency)
+HEAVY_MODULES = ['plotly.express', 'st_aggrid', 'gspread', 'google.oauth2']
+EAGER_IMPORTS = ['gspread', 'streamlit.runtime.scriptrunner', 'google.oauth2.service_account', 'pandas', 'plotly.express',
+                 'plotly.io', 'numpy', 'st_aggrid', 'sheets', 'snapshots', 'dashboard_data', 'dashboard_figures', 'dashboard_tables',
+                 'dashboard_sql', 'dashboard_exports', 'dashboard_memory', 'dashboard_profile', 'county_geometry']
+STARTUP_PROBE = """
+import hashlib, json, sys, time
+start = time.perf_counter()
+for name in {eager!r}:
+    __import__(name)
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('streamlitdashboard.py', default_timeout=600)
+app.secrets['clearance'] = {{'low_level': hashlib.sha256(b'low').hexdigest(), 'high_level': hashlib.sha256(b'high').hexdigest()}}
+app.secrets['gcp_service_account'] = {{}}
+app.secrets['snapshots'] = {{'path': {snapshots!r}}}
+app.run()
+assert app.text_input and not app.exception
+result = {{'prompt': time.perf_counter() - start, 'prompt modules': [name for name in {heavy!r} if name in sys.modules]}}
+if {page!r}:
+    opened = time.perf_counter()
+    import gspread
+    from google.oauth2 import service_account
+    from fake_gspread import FakeClient
+    worksheets = json.load(open({data!r}))
+    gspread.authorize = lambda credentials: FakeClient(worksheets)
+    service_account.Credentials.from_service_account_info = lambda *args, **kwargs: None
+    app.switch_page({page!r})
+    app.text_input[0].input('high').run()
+    assert not app.exception, app.exception[0].value
+    result['page'] = time.perf_counter() - opened
+    result['page modules'] = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps(result))
+"""
+
+
+def run_startup_probe(page=None, eager=(), data=None):
+    with tempfile.TemporaryDirectory() as directory:
+        code = STARTUP_PROBE.format(eager=list(eager), snapshots=directory, heavy=HEAVY_MODULES, page=page, data=data)
+        output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def server_startup(port=8599):
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', 'streamlitdashboard.py', '--server.headless', 'true',
+                               '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://localhost:{port}/_stcore/health', timeout=1).read()
+                return time.perf_counter() - start
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("streamlit run exited before answering its health check")
+                time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench_startup(rows=ROWS, repeat=3):
+    print(f"Startup: fresh process per measurement, best of {repeat}")
+    print(f"{'process startup (streamlit run)':<40} {min(server_startup() for _ in range(repeat)):8.3f} s")
+
+    def best(results, key):
+        return min(results, key=lambda result: result[key])
+
+    def modules(names):
+        return ', '.join(names) or 'none of ' + ', '.join(HEAVY_MODULES)
+
+    before = best([run_startup_probe(eager=EAGER_IMPORTS) for _ in range(repeat)], 'prompt')
+    after = best([run_startup_probe() for _ in range(repeat)], 'prompt')
+    print(f"{'password prompt, eager imports (before)':<40} {before['prompt']:8.3f} s  loaded {modules(before['prompt modules'])}")
+    print(f"{'password prompt, lazy pages (after)':<40} {after['prompt']:8.3f} s  loaded {modules(after['prompt modules'])}")
+    print(f"time to the password prompt: {before['prompt'] / after['prompt']:.1f}x faster")
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(synthetic_worksheets(rows), f, default=str)
+    try:
+        for page in ('page_charts.py', 'page_explore.py'):
+            opened = best([run_startup_probe(page=page, data=f.name) for _ in range(repeat)], 'page')
+            print(f"{'first open: ' + dashboard_page_title(page):<40} {opened['page']:8.3f} s  loaded {modules(opened['page modules'])}")
+    finally:
+        os.remove(f.name)
+
+
+BENCHMARKS = {
+    'cold_start': bench_cold_start,
+    'first_content': bench_first_content,
+    'shared_refresh': bench_shared_refresh,
+    'quota': bench_quota,
+    'process_data': bench_process_data,
+    'filters': bench_filters,
+    'export': bench_export,
+    'price_matching': bench_price_matching,
+    'name_index': bench_name_index,
+    'merge': bench_merge,
+    'pipeline': bench_pipeline,
+    'interactions': bench_interactions,
+    'startup': bench_startup,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the dashboard's data layer")
+    parser.add_argument('benchmarks', nargs='*', choices=[*BENCHMARKS, 'scaling', 'sql'], default=[*BENCHMARKS, 'scaling', 'sql'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000],
+                        help="rows per worksheet for the scaling and sql benchmarks")
+    parser.add_argument('--output', help="save the scaling results to this CSV file")
+    args = parser.parse_args()
+
+    for name in args.benchmarks:
+        if name == 'scaling':
+            results = bench_scaling(args.sizes)
+            if args.output:
+                results.to_csv(args.output, index=False)
+        elif name == 'sql':
+            bench_sql(args.sizes)
+        else:
+            BENCHMARKS[name]()
+        print()
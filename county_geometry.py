@@ -0,0 +1,186 @@
+import json
+import os
+import time
+from collections import defaultdict
+
+# Simplified county outlines for the dashboard choropleths
+# Running this file rebuilds COUNTY_LEVELS_PATH from the full GeoJSON and prints the payload size of each level:
+#   python county_geometry.py
+COUNTY_GEOJSON_PATH = 'south_carolina_counties.geojson'
+COUNTY_LEVELS_PATH = 'south_carolina_counties_levels.json'
+
+# Simplification tolerance of each level, in degrees (0.001 degrees is roughly 100 m)
+LEVELS = {
+    'full': 0,
+    'fine': 0.002,
+    'medium': 0.005,
+    'coarse': 0.01,
+}
+
+DEFAULT_WIDTH = 700  # pixels, width of a chart in the default Streamlit layout
+
+
+def polygons(geometry):
+    return [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+
+
+# Distance from point p to the segment a-b
+def segment_distance(p, a, b):
+    (x, y), (x1, y1), (x2, y2) = p, a, b
+    dx, dy = x2 - x1, y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    t = max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
+
+
+# Douglas-Peucker simplification of a line; both end points are always kept
+def simplify_line(points, tolerance):
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        distance, index = max(((segment_distance(points[i], points[first], points[last]), i)
+                               for i in range(first + 1, last)), default=(0, None))
+        if index is not None and distance > tolerance:
+            keep[index] = True
+            stack.extend([(first, index), (index, last)])
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+# Points where a ring's neighbours change: the border between two counties ends there
+# Borders are simplified between these points only, so two neighbouring counties always get the same simplified border
+def find_junctions(rings):
+    neighbours = defaultdict(set)
+    for ring in rings:
+        points = ring[:-1]  # rings are closed: the last point repeats the first
+        for i, point in enumerate(points):
+            pair = frozenset([points[i - 1], points[(i + 1) % len(points)]])
+            neighbours[point].add(pair)
+    return {point for point, pairs in neighbours.items() if len(pairs) > 1}
+
+
+# Split a closed ring into arcs that start and end on junctions
+def split_ring(ring, junctions):
+    points = ring[:-1]
+    starts = [i for i, point in enumerate(points) if point in junctions]
+    if not starts:
+        return [ring]  # island or a ring bordering one other ring only: simplify it as one arc
+    points = points[starts[0]:] + points[:starts[0]] + [points[starts[0]]]
+    arcs, current = [], [points[0]]
+    for point in points[1:]:
+        current.append(point)
+        if point in junctions:
+            arcs.append(current)
+            current = [point]
+    return arcs
+
+
+# Simplify every ring of every feature, simplifying each shared border once
+def simplify_features(features, tolerance):
+    rings = [[tuple(point) for point in ring] for feature in features
+             for polygon in polygons(feature['geometry']) for ring in polygon]
+    junctions = find_junctions(rings)
+    simplified_arcs = {}
+
+    def simplify_arc(arc):
+        key = min(tuple(arc), tuple(reversed(arc)))  # the same border walked in either direction
+        if key not in simplified_arcs:
+            simplified_arcs[key] = simplify_line(list(key), tolerance)
+        simplified = simplified_arcs[key]
+        return simplified if key == tuple(arc) else simplified[::-1]
+
+    def simplify_ring(ring):
+        ring = [tuple(point) for point in ring]
+        simplified = [ring[0]]
+        for arc in split_ring(ring, junctions):
+            simplified.extend(simplify_arc(arc)[1:])
+        if simplified[0] != simplified[-1]:
+            simplified.append(simplified[0])
+        return [list(point) for point in (simplified if len(simplified) >= 4 else ring)]  # never collapse a ring
+
+    simplified_features = []
+    for feature in features:
+        geometry = feature['geometry']
+        coordinates = [[simplify_ring(ring) for ring in polygon] for polygon in polygons(geometry)]
+        simplified_features.append({
+            'type': 'Feature',
+            'properties': {'name': feature['properties']['name']},  # the only property the choropleths use
+            'geometry': {'type': geometry['type'],
+                         'coordinates': coordinates[0] if geometry['type'] == 'Polygon' else coordinates},
+        })
+    return simplified_features
+
+
+def bounds(features):
+    points = [point for feature in features for polygon in polygons(feature['geometry'])
+              for ring in polygon for point in ring]
+    lons, lats = [point[0] for point in points], [point[1] for point in points]
+    return [min(lons), min(lats), max(lons), max(lats)]
+
+
+# All levels, the bounding box of the state and the county-name index, ready to be saved as one JSON file
+def build_levels(geojson, levels=LEVELS):
+    features = geojson['features']
+    return {
+        'bounds': bounds(features),
+        'counties': [feature['properties']['name'] for feature in features],
+        'tolerances': dict(levels),
+        'levels': {name: {'type': 'FeatureCollection', 'features': simplify_features(features, tolerance)}
+                   for name, tolerance in levels.items()},
+    }
+
+
+# Load the prebuilt levels, building them from the full GeoJSON if the file is missing
+def load_levels(path=COUNTY_LEVELS_PATH, source_path=COUNTY_GEOJSON_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    with open(source_path) as f:
+        return build_levels(json.load(f))
+
+
+# The coarsest level whose error stays under one pixel at the given chart width
+def pick_level(county_levels, width=DEFAULT_WIDTH):
+    west, _, east, _ = county_levels['bounds']
+    degrees_per_pixel = (east - west) / width
+    fitting = [(tolerance, name) for name, tolerance in county_levels['tolerances'].items() if tolerance <= degrees_per_pixel]
+    return max(fitting)[1] if fitting else min((tolerance, name) for name, tolerance in county_levels['tolerances'].items())[1]
+
+
+# Geo axis ranges with a small margin, so the figure doesn't need fitbounds="locations" computed in the browser
+def geo_ranges(county_levels, margin=0.1):
+    west, south, east, north = county_levels['bounds']
+    return {'lonaxis_range': [west - margin, east + margin], 'lataxis_range': [south - margin, north + margin]}
+
+
+# Payload size and build + serialize time of a choropleth at each level
+def report(county_levels, repeat=5):
+    import pandas as pd
+    import plotly.express as px
+    import plotly.io as pio
+
+    data = pd.DataFrame({'County': county_levels['counties'], 'Value': range(len(county_levels['counties']))})
+    for name, geojson in county_levels['levels'].items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fig = px.choropleth(data, geojson=geojson, locations='County', featureidkey="properties.name", color='Value')
+            fig.update_geos(visible=True, **geo_ranges(county_levels))
+            payload = pio.to_json(fig, validate=False)
+        elapsed = (time.perf_counter() - start) / repeat
+        points = sum(len(ring) for feature in geojson['features'] for polygon in polygons(feature['geometry']) for ring in polygon)
+        print(f"{name:<8} tolerance {county_levels['tolerances'][name]:<6} {points:5d} points  "
+              f"{len(payload) / 1024:6.1f} KB figure  {elapsed * 1000:6.1f} ms build + serialize")
+    print(f"level picked for a {DEFAULT_WIDTH} px chart: {pick_level(county_levels)}")
+
+
+if __name__ == '__main__':
+    with open(COUNTY_GEOJSON_PATH) as f:
+        county_levels = build_levels(json.load(f))
+    with open(COUNTY_LEVELS_PATH, 'w') as f:
+        json.dump(county_levels, f, separators=(',', ':'))
+    print(f"County levels saved to {COUNTY_LEVELS_PATH}")
+    report(county_levels)
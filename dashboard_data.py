@@ -0,0 +1,225 @@
+import hashlib
+import hmac
+import json
+from contextlib import nullcontext
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from name_index import NameIndex
+
+# Column types of each worksheet used by the dashboard
+#   'currency': '$' and ',' stripped, then parsed as a number (kept as float64 so summed totals stay exact to the cent)
+#   'category': repeated labels stored once as a categorical
+#   'int':      whole numbers as a nullable Int32 (float32 if the sheet holds fractions)
+# Columns that are not listed keep the type get_all_records gave them
+SCHEMAS = {
+    'TechInventory': {
+        'Quantity': 'int',
+        'Section': 'category',
+        'Combined_Section': 'category',
+        'Estimated Price': 'currency',
+    },
+    'FullPhones': {
+        'Equipment Model': 'category',
+        'Location': 'category',
+        'Administration': 'category',
+        'Storage': 'category',
+        'Monthly Access Charges': 'currency',
+        'Usage Charges': 'currency',
+        'Equipment Charges': 'currency',
+        'Surcharges and Other Charges and Credits': 'currency',
+        'Taxes Governmental Surcharges and Fees': 'currency',
+        'Third Party Charges (Includes Tax)': 'currency',
+        'Total Charges': 'currency',
+        'Estimated Price': 'currency',
+    },
+    'StationaryTech': {
+        'Department': 'category',
+        'Device': 'category',
+        'Warehouse': 'category',
+        'Estimated Price': 'currency',
+    },
+}
+
+# Used for worksheets without a schema of their own
+DEFAULT_SCHEMA = {
+    'Total Charges': 'currency',
+    'Estimated Price': 'currency',
+}
+
+# Version of the processed data, saved with every snapshot: snapshots from another version are thrown away
+# It follows the schemas; bump PROCESSING_REVISION when process_data changes in any other way
+PROCESSING_REVISION = 2
+PROCESSING_VERSION = hashlib.sha256(json.dumps([PROCESSING_REVISION, SCHEMAS, DEFAULT_SCHEMA], sort_keys=True).encode()).hexdigest()[:16]
+
+
+# Text is cast straight to float64, several times faster than pd.to_numeric; only a column holding blanks or other text
+# goes through pd.to_numeric, to find those cells (they become NaN), and the numbers are then cast the same way
+def parse_currency(values):
+    if is_numeric_dtype(values):
+        return values.astype('float64')
+    if not pd.api.types.is_string_dtype(values):
+        values = values.astype(str)
+    text = values.str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+    try:
+        return text.astype('float64')
+    except ValueError:
+        return text.where(pd.to_numeric(text, errors='coerce').notna()).astype('float64')
+
+
+def parse_int(values):
+    numbers = pd.to_numeric(values, errors='coerce')
+    if ((numbers % 1).fillna(0) == 0).all():
+        return numbers.astype('Int32')
+    return numbers.astype('float32')
+
+
+# Labels as text (numbers and blanks included, so every label has one type), then stored once each as a categorical
+# Columns that already hold only text skip the cast, which costs more than the conversion itself
+def parse_category(values):
+    if not pd.api.types.is_string_dtype(values):
+        values = values.astype(str)
+    return values.astype('category')
+
+
+COLUMN_PARSERS = {
+    'currency': parse_currency,
+    'category': parse_category,
+    'int': parse_int,
+}
+
+
+# Processing Data
+# One pass over the columns listed in the worksheet's schema, then the derived totals
+def process_data(data, worksheet_name=None):
+    schema = SCHEMAS.get(worksheet_name, DEFAULT_SCHEMA)
+    if 'RowID' in data.columns: # Only used by Shiny app
+        data = data.drop(columns=['RowID'])
+    data = data.assign(**{column: COLUMN_PARSERS[kind](data[column])
+                          for column, kind in schema.items() if column in data.columns})
+    if 'Total Charges' in data.columns:
+        data['Annual Phone Bill'] = data['Total Charges'] * 12
+    if 'Estimated Price' in data.columns and 'Quantity' in data.columns:
+        data['Total Value'] = data['Quantity'].astype('float64') * data['Estimated Price']
+    return data
+
+
+# Memory used by each column (strings included) before and after processing, in bytes
+def memory_report(before, after):
+    report = pd.DataFrame({
+        'before': before.memory_usage(deep=True, index=False),
+        'after': after.memory_usage(deep=True, index=False),
+        'dtype before': before.dtypes.astype(str),
+        'dtype after': after.dtypes.astype(str),
+    })
+    report.loc['Total', ['before', 'after']] = report[['before', 'after']].sum()
+    return report
+
+
+# Function to map location to county for Harvest Hope offices
+def get_county(location):
+    if location == "Columbia":
+        return "Richland"
+    return location
+
+
+# Merge the existing data with this complete list
+# First convert cities to counties (it is an injective map) and then add all other counties with default value 0
+def prepare_data(data, data_columns, all_counties_df, default_value=0):
+    location_column = 'Location' if 'Location' in data.columns else 'Warehouse' # named different in different sheets
+    # hypothetically, if multiple locations mapped to the same county, we would need to sum them which is what the next two lines do. currently for Harvest Hope, this is an impossible scenario, but it is handled.
+    data = data.assign(County=data[location_column].astype(str).map(get_county))
+    data = data.groupby('County')[data_columns].sum().reset_index() # each county name and its summed data_columns
+    merged_data = pd.merge(all_counties_df, data, on='County', how='left') # Taking every row from all_counties and adding data_columns from 'data' to it if 'data' has that county
+    merged_data[data_columns] = merged_data[data_columns].fillna(default_value)
+    return merged_data
+
+
+def sum_by(data, dimension, columns):
+    return data.groupby(dimension, observed=True)[columns].sum().reset_index()
+
+
+# Every rollup the charts and choropleths need, computed in one go per data version
+# Keys are chart-independent so several charts can share one rollup
+# `name_indexes` maps free-text columns to a name_index.NameIndex, so spellings of one product are grouped together
+# `stage(name)` is an optional context manager factory used to time each step (see dashboard_profile.Profiler.stage)
+def build_rollups(data_server, data_phone, data_stationary, all_counties_df, stage=lambda name: nullcontext(), name_indexes=None):
+    name_indexes = name_indexes or {}
+    rollups = {'totals': {}}
+    if not data_server.empty:
+        with stage('rollups/server groupby'):
+            rollups['totals']['storage_value'] = data_server['Total Value'].sum()
+            rollups['server_by_section'] = sum_by(data_server, 'Combined_Section', 'Total Value')
+    if not data_phone.empty:
+        with stage('rollups/phone groupby'):
+            rollups['totals']['annual_phone_bill'] = data_phone['Annual Phone Bill'].sum()
+            rollups['totals']['phones_value'] = data_phone['Estimated Price'].sum()
+            by_location = data_phone.groupby('Location', observed=True).agg(**{
+                'Number of Phones': ('Location', 'size'),
+                'Annual Phone Bill': ('Annual Phone Bill', 'sum'),
+                'Estimated Price': ('Estimated Price', 'sum'),
+            }).reset_index()
+            rollups['phones_by_location'] = by_location
+            administration = data_phone['Administration'].astype(str).map({'Y': 'Yes', 'N': 'No'})
+            rollups['phones_by_administration'] = data_phone['Annual Phone Bill'].groupby(administration).sum().reset_index().rename(columns={'index': 'Administration'})
+        with stage('rollups/phone prepare_data'):
+            rollups['phones_by_county'] = prepare_data(by_location, ['Number of Phones', 'Annual Phone Bill', 'Estimated Price'], all_counties_df)
+    if not data_stationary.empty:
+        with stage('rollups/workstation groupby'):
+            rollups['totals']['stationary_value'] = data_stationary['Estimated Price'].sum()
+            devices = name_indexes['Device'].map(data_stationary['Device']) if 'Device' in name_indexes else data_stationary['Device']
+            rollups['stationary_by_device'] = sum_by(data_stationary.assign(Device=devices), 'Device', 'Estimated Price')
+            rollups['stationary_by_warehouse'] = sum_by(data_stationary, 'Warehouse', 'Estimated Price')
+            rollups['stationary_by_department'] = sum_by(data_stationary, 'Department', 'Estimated Price')
+        with stage('rollups/workstation prepare_data'):
+            rollups['stationary_by_county'] = prepare_data(rollups['stationary_by_warehouse'], ['Estimated Price'], all_counties_df)
+    # Every county metric side by side, for the single multi-metric choropleth
+    with stage('rollups/county merge'):
+        county_metrics = all_counties_df
+        if 'phones_by_county' in rollups:
+            county_metrics = county_metrics.merge(rollups['phones_by_county'].rename(columns={'Estimated Price': 'Phone Valuation'}), on='County')
+        if 'stationary_by_county' in rollups:
+            county_metrics = county_metrics.merge(rollups['stationary_by_county'].rename(columns={'Estimated Price': 'Workstation Valuation'}), on='County')
+    rollups['county_metrics'] = county_metrics
+    return rollups
+
+
+# Free-text name columns of each worksheet that the charts group by canonical product name (see name_index.py)
+NAME_COLUMNS = {
+    'StationaryTech': 'Device',
+}
+
+
+# A NameIndex per name column present in the worksheets, keyed by column
+def build_name_indexes(worksheets):
+    return {column: NameIndex(worksheets[name][column]) for name, column in NAME_COLUMNS.items()
+            if name in worksheets and column in worksheets[name].columns}
+
+
+# Columns replaced with pseudonyms for low clearance users, and the label each pseudonym starts with
+ANONYMIZED_COLUMNS = {
+    'Username': 'User',
+    'Number': 'Number',
+    'Device ID': 'Device',
+}
+
+
+# Hex digits of the keyed hash kept in a pseudonym: 64 bits, so even millions of distinct values practically never collide
+PSEUDONYM_LENGTH = 16
+
+
+# Stable pseudonym for every value of a column, e.g. 'User 3f9a1c07d25e84b6'
+# A keyed hash of the value, so the same person gets the same pseudonym in every rerun, session and data version,
+# while the original can't be recovered without the key. Blank cells stay blank.
+def pseudonymize(values, label, key):
+    codes, uniques = pd.factorize(values.astype(str))
+    pseudonyms = pd.Index([f"{label} {hmac.new(key, f'{label}:{value}'.encode(), hashlib.sha256).hexdigest()[:PSEUDONYM_LENGTH]}"
+                           if value.strip() else value for value in uniques])
+    return pd.Series(pd.Categorical(pseudonyms.take(codes)), index=values.index)
+
+
+# Redacted copy of a worksheet, built once per data version and shared read-only by every low clearance session
+def anonymize(data, key, columns=ANONYMIZED_COLUMNS):
+    if isinstance(key, str):
+        key = key.encode()
+    return data.assign(**{column: pseudonymize(data[column], label, key)
+                          for column, label in columns.items() if column in data.columns})
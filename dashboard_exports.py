@@ -0,0 +1,98 @@
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.parquet as pq
+import snapshots
+
+# Download formats: label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+CHUNK_ROWS = 10_000  # rows serialized at a time while writing the file; the download still reads the whole file back
+
+
+# Serialize the given rows of a table chunk by chunk into the binary file f
+def write_export(source, rows, export_format, f, chunk_rows=CHUNK_ROWS):
+    chunks = (source.take(rows[start:start + chunk_rows]) for start in range(0, max(len(rows), 1), chunk_rows))
+    if export_format == 'Parquet':
+        mixed = snapshots.mixed_columns(source.data)  # decided on the whole table, so every chunk gets the same schema
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(snapshots.arrow_safe(chunk, mixed), preserve_index=False,
+                                         schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(f, table.schema)
+            writer.write_table(table)  # one row group per chunk
+        writer.close()
+        return
+    binary = gzip.GzipFile(fileobj=f, mode='wb') if export_format == 'CSV (gzip)' else f
+    text = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(text, index=False, header=(i == 0))
+    text.flush()
+    text.detach()
+    if binary is not f:
+        binary.close()
+
+
+# Finished exports on disk, keyed by (data version, table, filters, sort, format)
+# Files are only written when someone asks for a download, and repeated downloads of the same view reuse the file
+# Each key has its own lock, so an export only waits for another download of the same view.
+class ExportCache:
+    def __init__(self, directory=None, max_files=32):
+        self.directory = directory or tempfile.mkdtemp(prefix='hh_exports_')
+        self.max_files = max_files
+        self.files = OrderedDict()
+        self.key_locks = {}  # key -> lock held while its file is written or read
+        self.lock = threading.Lock()  # guards files and key_locks
+
+    def path(self, key, export_format):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:24]
+        return os.path.join(self.directory, f"{digest}.{EXPORT_FORMATS[export_format][0]}")
+
+    # Return the bytes of the export, writing it first if it isn't cached yet
+    def get(self, key, source, rows, export_format):
+        key = (key, export_format)
+        while True:
+            with self.lock:
+                key_lock = self.key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                with self.lock:
+                    if self.key_locks.get(key) is not key_lock:
+                        continue  # evicted while we waited for it: take the key's new lock
+                    path = self.files.get(key)
+                if path is None or not os.path.exists(path):
+                    path = self.path(key, export_format)
+                    with open(path + '.tmp', 'wb') as f:
+                        write_export(source, rows, export_format, f)
+                    os.replace(path + '.tmp', path)
+                with self.lock:
+                    self.files[key] = path
+                    self.files.move_to_end(key)
+                    self.evict()
+                # st.download_button only takes the whole file, so a download holds it in memory once
+                with open(path, 'rb') as f:  # still under the key's lock, so the file can't be evicted before it is read
+                    return f.read()
+
+    # Remove the least recently used files past max_files, skipping those being written or read right now
+    # Callers must hold self.lock.
+    def evict(self):
+        for key in list(self.files)[:max(0, len(self.files) - self.max_files)]:
+            key_lock = self.key_locks[key]
+            if not key_lock.acquire(blocking=False):
+                continue
+            try:
+                path = self.files.pop(key)
+                del self.key_locks[key]
+                if os.path.exists(path):
+                    os.remove(path)
+            finally:
+                key_lock.release()
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+import plotly.graph_objects as go
+
+# Process-wide cache of built Plotly figures, keyed by (data version, chart id, widget selection)
+# A rerun triggered by one widget only rebuilds the charts whose key changed; every other chart is reused as is.
+# Cached figures are shared between sessions, so they must not be modified after they are built.
+class FigureCache:
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.figures = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Return the cached figure for this key, or build() it and cache it
+    def get(self, version, chart_id, selection, build, report=None):
+        key = (version, chart_id, selection)
+        start = time.perf_counter()
+        with self.lock:
+            figure = self.figures.get(key)
+            if figure is not None:
+                self.figures.move_to_end(key)
+        hit = figure is not None
+        if not hit:
+            figure = build()
+            with self.lock:
+                self.figures[key] = figure
+                while len(self.figures) > self.max_entries:
+                    self.figures.popitem(last=False)  # least recently used
+        if report is not None:
+            report.record(chart_id, selection, hit, time.perf_counter() - start)
+        return figure
+
+
+# Which figures one rerun served from the cache and which it had to rebuild, and how long each took
+class FigureReport:
+    def __init__(self):
+        self.rows = []
+
+    def record(self, chart_id, selection, hit, seconds):
+        self.rows.append({'Chart': chart_id, 'Selection': selection, 'Cached': hit, 'Time (ms)': seconds * 1000})
+
+    @property
+    def hits(self):
+        return sum(row['Cached'] for row in self.rows)
+
+    @property
+    def rebuilt(self):
+        return len(self.rows) - self.hits
+
+    def to_frame(self):
+        return pd.DataFrame(self.rows, columns=['Chart', 'Selection', 'Cached', 'Time (ms)'])
+
+
+# One choropleth carrying several metrics, with buttons that switch the metric in the browser
+# Only the z values and titles change, so switching needs no Streamlit rerun and the county outlines are sent once
+#   metrics: list of (column in data, button label, figure title, hover value format)
+def build_metric_choropleth(data, geojson, metrics, colorscale, geo_ranges=None):
+    def hovertemplate(label, hover_format):
+        return f"%{{location}}<br>{label}: %{{z:{hover_format}}}<extra></extra>"
+
+    column, label, title, hover_format = metrics[0]
+    fig = go.Figure(go.Choropleth(geojson=geojson, locations=data['County'], featureidkey="properties.name",
+                                  z=data[column], colorscale=colorscale, colorbar_title_text=label,
+                                  hovertemplate=hovertemplate(label, hover_format),
+                                  marker_line_width=0.5, marker_line_color='black'))
+    buttons = [{'label': label, 'method': 'update',
+                'args': [{'z': [data[column].tolist()], 'colorbar.title.text': label,
+                          'hovertemplate': hovertemplate(label, hover_format)},
+                         {'title.text': title}]}
+               for column, label, title, hover_format in metrics]
+    fig.update_layout(title_text=title, updatemenus=[{
+        'type': 'buttons', 'direction': 'right', 'buttons': buttons,
+        'x': 0, 'xanchor': 'left', 'y': 1.02, 'yanchor': 'bottom',
+    }])
+    fig.update_geos(visible=True, **(geo_ranges or {'fitbounds': 'locations'}))
+    return fig
@@ -0,0 +1,152 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Process-wide store of the datasets derived from the worksheets (anonymized views, table sources)
+# Every session references the same read-only objects instead of holding copies, so adding a user adds
+# only that user's widget state. Entries are keyed by data version and the least recently used are evicted.
+class SharedStore:
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Return the stored object for this key, or build() it, freeze it and store it
+    def get(self, key, build):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+                return value
+        value = freeze(build())
+        with self.lock:
+            value = self.entries.setdefault(key, value)  # keep the first one if two sessions built it at once
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)  # least recently used
+        return value
+
+    def items(self):
+        with self.lock:
+            return list(self.entries.items())
+
+
+# The numpy arrays holding the values of a pandas array (Arrow-backed arrays are immutable already)
+def numpy_buffers(values):
+    if isinstance(values, np.ndarray):
+        return [values]
+    return [getattr(values, name) for name in ('_ndarray', '_data', '_mask', '_codes')
+            if isinstance(getattr(values, name, None), np.ndarray)]
+
+
+# Make a DataFrame (or the DataFrames inside an object) read-only, in place
+# Writing into a frozen frame raises "assignment destination is read-only" instead of silently changing
+# the data every other session sees. Frames derived from it (assign, filters, copies) stay writable.
+def freeze(value):
+    if isinstance(value, pd.DataFrame):
+        frames = [value]
+    else:
+        items = value.values() if isinstance(value, dict) else vars(value).values() if hasattr(value, '__dict__') else []
+        frames = [item for item in items if isinstance(item, pd.DataFrame)]
+    for frame in frames:
+        for block in frame._mgr.blocks:
+            for array in numpy_buffers(block.values):
+                array.flags.writeable = False
+    return value
+
+
+# (address, bytes) of every buffer behind a pandas array, so memory shared between frames is counted once
+def buffers(values):
+    arrow = getattr(values, '_pa_array', None)
+    if arrow is not None:
+        return [(buffer.address, buffer.size) for chunk in arrow.chunks for buffer in chunk.buffers() if buffer is not None]
+    found = [(array.__array_interface__['data'][0], array.nbytes) for array in numpy_buffers(values)]
+    if isinstance(values, pd.Categorical):
+        found += buffers(values.categories.array)
+    if not found or (isinstance(values, np.ndarray) and values.dtype == object):
+        # Python objects (e.g. strings in an object column) live outside the array
+        found.append((id(values), pd.Series(values, copy=False).memory_usage(deep=True, index=False)))
+    return found
+
+
+# Approximate bytes held by an object, skipping buffers already in `seen` and adding the new ones to it
+# Counts DataFrames by their column buffers, and everything else by walking its containers and attributes
+def deep_bytes(value, seen=None):
+    seen = set() if seen is None else seen
+    if isinstance(value, pd.DataFrame):
+        return sum(deep_bytes(value[column].array, seen) for column in value.columns)
+    if isinstance(value, pd.Series):
+        return deep_bytes(value.array, seen)
+    if isinstance(value, (np.ndarray, pd.api.extensions.ExtensionArray)):
+        total = 0
+        for address, size in buffers(value):
+            if address not in seen:
+                seen.add(address)
+                total += size
+        return total
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if hasattr(value, 'to_plotly_json'):  # Plotly figures
+        return deep_bytes(value.to_plotly_json(), seen)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(deep_bytes(k, seen) + deep_bytes(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(deep_bytes(item, seen) for item in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + deep_bytes(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+# Last known state of every browser session, for the memory page
+# Each rerun records its own session state; sessions not seen for `expire_after` seconds are dropped.
+class SessionRegistry:
+    def __init__(self, expire_after=3600, clock=time.time):
+        self.expire_after = expire_after
+        self.clock = clock
+        self.sessions = {}  # session id -> (clearance, {key: value} of its session state, last seen)
+        self.lock = threading.Lock()
+
+    def record(self, session_id, clearance, state):
+        now = self.clock()
+        with self.lock:
+            self.sessions[session_id] = (clearance, dict(state), now)
+            for old_id in [old_id for old_id, (_, _, seen_at) in self.sessions.items() if now - seen_at > self.expire_after]:
+                del self.sessions[old_id]
+
+    # Bytes held by each session on top of the shared objects (whose buffers are passed in `shared_seen`)
+    def to_frame(self, shared_seen=()):
+        now = self.clock()
+        with self.lock:
+            sessions = list(self.sessions.items())
+        rows = [{'Session': session_id[:8], 'Clearance': clearance,
+                 'Bytes': deep_bytes(state, set(shared_seen)), 'Idle (s)': round(now - seen_at)}
+                for session_id, (clearance, state, seen_at) in sessions]
+        return pd.DataFrame(rows, columns=['Session', 'Clearance', 'Bytes', 'Idle (s)'])
+
+
+# Bytes of each shared object, counting memory shared between them once (in the first object that holds it)
+# Returns the report and the set of shared buffers
+def shared_report(objects):
+    seen = set()
+    rows = [{'Object': name, 'Bytes': deep_bytes(value, seen)} for name, value in objects]
+    return pd.DataFrame(rows, columns=['Object', 'Bytes']), seen
+
+
+# Resident memory of the whole process in bytes, where the platform reports it (Linux)
+def process_rss():
+    try:
+        import resource
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (ImportError, OSError, ValueError, IndexError):
+        return None
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:,.0f} {unit}" if unit == 'B' else f"{size:,.1f} {unit}"
+        size /= 1024
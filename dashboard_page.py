@@ -0,0 +1,251 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import gspread
+from google.oauth2.service_account import Credentials
+import pandas as pd
+import sheets
+import sheets_client
+import snapshots
+import dashboard_data
+import dashboard_sql
+import dashboard_memory
+import dashboard_profile
+
+# What every page of the dashboard shares: the Sheets client and worksheet cache, the process-wide caches,
+# and one PageRun per page run (header, progressive loading of the sections, footer panels)
+# Pages import this module the first time one of them is opened, not before the password prompt.
+
+
+# Cache the scope, credentials, and client authorization
+# The client coalesces identical reads in flight, stays within the Sheets quota and retries 429/5xx answers
+# (see sheets_client.py; `requests_per_minute` and `max_retries` under [quota] in secrets.toml)
+@st.cache_resource
+def get_gspread_client():
+    # Authentication - Secure way to handle API keys or credentials without including it in the app's public files
+    scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=scope)
+    client = gspread.authorize(creds)
+    quota = st.secrets.get("quota", {})
+    return sheets_client.QuotaClient(client, limit=quota.get("requests_per_minute", sheets_client.REQUESTS_PER_MINUTE),
+                                     max_retries=quota.get("max_retries", sheets_client.MAX_RETRIES))
+
+
+# One worksheet cache per process, shared by every session
+# It checks the spreadsheet's revision at most once per TTL and only re-fetches and re-processes worksheets that changed.
+# After a restart it starts from the on-disk snapshot and revalidates it in the background.
+@st.cache_resource
+def get_worksheet_cache():
+    ttl = st.secrets.get("refresh", {}).get("ttl_seconds", sheets.REFRESH_TTL)
+    snapshot_store = snapshots.SnapshotStore(st.secrets.get("snapshots", {}).get("path", snapshots.SNAPSHOT_DIR),
+                                             version=dashboard_data.PROCESSING_VERSION)
+    return sheets.WorksheetCache(get_gspread_client(), process=dashboard_data.process_data, ttl=ttl, snapshots=snapshot_store)
+
+
+# Canonical product names of the free-text name columns (Item, Equipment Model, Device), built once per data version
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_name_indexes(version, _worksheets, _profiler):
+    _profiler.miss('name indexes')
+    return dashboard_data.build_name_indexes(_worksheets)
+
+
+# Optional SQL engine (see dashboard_sql.py, `mode = "sql"` under [engine]): the worksheets of each data version
+# in one embedded database shared by every session, answering the rollups and table filters instead of pandas
+def sql_mode():
+    return st.secrets.get("engine", {}).get("mode", "pandas") == "sql"
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_sql_engine(version, _worksheets, _profiler):
+    _profiler.miss('sql engine')
+    return dashboard_sql.SqlEngine(_worksheets, memory_limit=st.secrets.get("engine", {}).get("memory_limit"))
+
+
+# Datasets derived from the worksheets live in one process-wide store of read-only objects;
+# sessions only hold references to them, so each extra user costs little more than their widget state
+@st.cache_resource
+def get_shared_store():
+    return dashboard_memory.SharedStore()
+
+
+# Every session records its own state, so the memory page can see what each one holds
+@st.cache_resource
+def get_session_registry():
+    return dashboard_memory.SessionRegistry()
+
+
+# One run of a page (a full rerun; section reruns reuse it): draws the header, starts loading the worksheets,
+# and holds this run's profiler, so the page's sections can time themselves against it
+class PageRun:
+    def __init__(self, page):
+        self.page = page
+        # Opt-in timings of this rerun: on for every session with `enabled = true` under [profiling] in secrets.toml,
+        # or for one session with the "Profile this session" toggle at the bottom of the page (high clearance)
+        self.profiling = st.secrets.get("profiling", {})
+        self.profiler = self.new_profiler()
+        self.figure_report = None  # set by pages with charts, for the chart cache report
+
+        self.auth_message = st.empty()
+        self.auth_message.success(f"Authentication with {st.session_state['clearance_level']} clearance successful.")
+
+        st.title("Harvest Hope Tech Dashboard")
+
+        # Manual refresh skips the TTL and re-checks the spreadsheet right away
+        refresh_now = st.button("Refresh data now")
+
+        # Without any data yet (first start, no snapshot), the worksheets load in the background, each on its own worker thread,
+        # and every section of the page fills in as soon as the worksheets it shows are ready
+        self.worksheet_cache = get_worksheet_cache()
+        try:
+            with self.profiler.stage('load worksheets'):
+                self.worksheets = self.worksheet_cache.get(force=refresh_now, wait=False)
+        except Exception as e:
+            self.worksheets = self.worksheet_cache.data # Last successfully loaded data or snapshot, empty if there is none
+            self.worksheet_cache.last_error = e
+        self.load_status = st.empty() # warning or error about the last load, shown once loading is over
+
+        self.shared_store = get_shared_store()
+
+    def new_profiler(self):
+        return dashboard_profile.Profiler(enabled=self.profiling.get("enabled", False) or st.session_state.get('profile_session', False))
+
+    # Keep a profiling record of this rerun in the session (last 100 reruns) and append it to `log` under [profiling] if set
+    def save_profile(self, **fields):
+        script_run_ctx = get_script_run_ctx()
+        record = self.profiler.record(session=script_run_ctx.session_id if script_run_ctx else None,
+                                      clearance=st.session_state['clearance_level'], page=self.page, **fields)
+        st.session_state['profile_history'] = (st.session_state.get('profile_history', []) + [record])[-100:]
+        if self.profiling.get("log"):
+            dashboard_profile.append_jsonl(self.profiling["log"], [record])
+        return record
+
+    def name_indexes(self, worksheets):
+        with self.profiler.cached('name indexes'):
+            return get_name_indexes(worksheets.version, worksheets, self.profiler)
+
+    def sql_engine(self, worksheets):
+        with self.profiler.cached('sql engine'):
+            return get_sql_engine(worksheets.version, worksheets, self.profiler)
+
+    # Each chart and table section is a fragment: a widget inside it reruns only that section (with the worksheets
+    # it was drawn with) instead of the whole page. A section rerun gets its own profiling record and chart cache report.
+    def section(self, name, render):
+        @st.fragment
+        def rerunnable(worksheets):
+            script_run_ctx = get_script_run_ctx()
+            section_rerun = script_run_ctx is not None and bool(script_run_ctx.fragment_ids_this_run)
+            if section_rerun:
+                self.profiler = self.new_profiler()
+                if self.figure_report is not None:
+                    self.figure_report = type(self.figure_report)()
+            with self.profiler.stage(f'section {name}'):
+                render(worksheets)
+            if section_rerun and self.profiler.enabled:
+                self.save_profile(version=worksheets.version, section=name)
+        return rerunnable
+
+    # A section drawn in its own placeholder, with `note` in it while its worksheets load
+    # Returns the (worksheets it needs, draw, draw while loading) entry that show() takes
+    def placeholder_section(self, needs, name, render, note):
+        placeholder = st.empty()
+        rerunnable = self.section(name, render)
+
+        def draw(worksheets):
+            with placeholder.container():
+                rerunnable(worksheets)
+        return needs, draw, lambda: placeholder.info(note)
+
+    # Draw every section whose worksheets are ready, then wait for the next worksheet to arrive and repeat.
+    # Once loading is over, what is still pending is drawn with whatever data there is (nothing, if its worksheet failed).
+    #   sections: list of (worksheets it needs, draw(worksheets), draw while loading), top to bottom
+    def show(self, sections):
+        pending = list(sections)
+        first_pass = True
+        while pending:
+            loading = self.worksheet_cache.loading
+            for section in list(pending):
+                needs, draw, waiting = section
+                if loading and not all(name in self.worksheets for name in needs):
+                    if first_pass:
+                        waiting()
+                    continue
+                draw(self.worksheets)
+                pending.remove(section)
+            first_pass = False
+            if pending:
+                with self.profiler.stage('wait for worksheets'):
+                    self.worksheets = self.worksheet_cache.wait(self.worksheets)
+
+        load_error = self.worksheet_cache.last_error # set if the last load or background check failed
+        if load_error is not None:
+            if self.worksheets:
+                self.load_status.warning(f"Could not reach {sheets.SPREADSHEET_NAME}, showing the last saved data: {str(load_error)}")
+            else:
+                self.load_status.error(f"Failed to load data from {sheets.SPREADSHEET_NAME}: {str(load_error)}")
+
+        if st.session_state['clearance_level'] == 'high': self.auth_message.empty() # If high level, they no longer need to see what authentication they signed in as -  they have everything.
+
+    # Session registry and, for high clearance users, the chart cache, memory and profiling panels
+    #   shared: returns the page's own process-wide objects as (name, object), for the memory report
+    def footer(self, shared=lambda: []):
+        session_registry = get_session_registry()
+        script_run_ctx = get_script_run_ctx()
+        if script_run_ctx is not None:
+            session_registry.record(script_run_ctx.session_id, st.session_state['clearance_level'], st.session_state.to_dict())
+
+        # Chart cache report for high clearance users: which figures this rerun reused and which it rebuilt
+        if st.session_state['clearance_level'] == 'high':
+            if self.figure_report is not None:
+                with st.expander(f"Chart cache: {self.figure_report.hits} cached, {self.figure_report.rebuilt} rebuilt"):
+                    st.dataframe(self.figure_report.to_frame())
+
+            # Memory accounting: what the process holds once for everyone, what each session adds on top,
+            # and the resulting estimate for a number of concurrent users (to size the container)
+            with st.expander("Memory usage"):
+                if st.toggle("Measure memory", key="measure_memory"): # walking every cached object takes a moment, so only on demand
+                    shared, shared_seen = dashboard_memory.shared_report(
+                        [('Worksheets', self.worksheets)] + shared()
+                        + [(' / '.join(str(part) for part in key[1:]), value) for key, value in self.shared_store.items()])
+                    sessions = session_registry.to_frame(shared_seen)
+                    per_session = sessions['Bytes'].max() if not sessions.empty else 0
+                    users = st.number_input("Concurrent users:", min_value=1, value=max(len(sessions), 10), step=1)
+
+                    col1, col2, col3, col4 = st.columns(4)
+                    col1.metric("Shared", dashboard_memory.format_bytes(shared['Bytes'].sum()))
+                    col2.metric("Largest session", dashboard_memory.format_bytes(per_session))
+                    col3.metric(f"Estimate for {users} users", dashboard_memory.format_bytes(shared['Bytes'].sum() + users * per_session))
+                    rss = dashboard_memory.process_rss()
+                    if rss is not None:
+                        col4.metric("Process resident memory", dashboard_memory.format_bytes(rss))
+                    st.write("Shared objects (memory shared between objects is counted once):")
+                    st.dataframe(shared)
+                    st.write(f"Sessions seen in the last hour: {len(sessions)}")
+                    st.dataframe(sessions)
+
+        # Profiling record of this rerun
+        if self.profiler.enabled:
+            profile_record = self.save_profile(version=self.worksheets.version,
+                                               refresh={name: seconds * 1000 for name, seconds in self.worksheet_cache.timings.items()})
+
+        # Profiling panel for high clearance users: where this rerun's time went, which caches it hit and what it sent
+        if st.session_state['clearance_level'] == 'high':
+            with st.expander("Profiling"):
+                st.toggle("Profile this session", key="profile_session", help="Takes effect from the next interaction")
+                if self.profiler.enabled:
+                    st.metric("This rerun (up to this panel)", f"{profile_record['total_ms']:,.0f} ms")
+                    st.write("Stages:")
+                    st.dataframe(pd.DataFrame(profile_record['stages'], columns=['name', 'ms']))
+                    col1, col2 = st.columns(2)
+                    col1.write("Caches:")
+                    col1.dataframe(pd.DataFrame(profile_record['caches'], columns=['name', 'hit']))
+                    col2.write("Payload bytes:")
+                    col2.dataframe(pd.DataFrame(profile_record['payloads'], columns=['name', 'bytes']))
+                    st.write("Last data refresh (ms):")
+                    st.dataframe(pd.DataFrame(profile_record['refresh'].items(), columns=['step', 'ms']))
+                    st.write("Sheets API client since the app started:")
+                    st.dataframe(pd.DataFrame(get_gspread_client().counters.items(), columns=['counter', 'value']))
+                    st.write("Recent reruns of whole pages and of single sections (ms):")
+                    st.dataframe(pd.DataFrame([{'page': record.get('page'), 'rerun': record.get('section', 'page'), 'ms': record['total_ms']}
+                                               for record in st.session_state['profile_history'][-20:]]))
+                    st.download_button("Download this session's profile (JSON lines)",
+                                       data=dashboard_profile.to_jsonl(st.session_state['profile_history']),
+                                       file_name="dashboard_profile.jsonl", mime="application/x-ndjson")
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Opt-in timings of one dashboard rerun
+# Stages are named blocks of the script (e.g. 'load worksheets', 'rollups/prepare_data'), caches record whether
+# each cached step was served from its cache, and payloads the bytes each chart or table sent to the browser.
+# A disabled profiler records nothing and its stage() is a no-op, so the instrumentation can stay in the script.
+class Profiler:
+    def __init__(self, enabled=False, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.started_at = time.time()
+        self.start = clock()
+        self.stages = []  # (name, seconds) in the order they finished
+        self.caches = []  # (name, hit)
+        self.payloads = []  # (name, bytes)
+        self.misses = set()
+
+    @contextmanager
+    def timed(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.stages.append((name, self.clock() - start))
+
+    def stage(self, name):
+        return self.timed(name) if self.enabled else nullcontext()
+
+    # Time a cached step. The cached function calls miss(name) when its body runs, so the call was a hit otherwise.
+    @contextmanager
+    def cached(self, name):
+        if not self.enabled:
+            yield
+            return
+        self.misses.discard(name)
+        with self.timed(name):
+            yield
+        self.caches.append((name, name not in self.misses))
+
+    def miss(self, name):
+        if self.enabled:
+            self.misses.add(name)
+
+    def cache(self, name, hit):
+        if self.enabled:
+            self.caches.append((name, hit))
+
+    def payload(self, name, size):
+        if self.enabled:
+            self.payloads.append((name, size))
+
+    # One JSON-serializable record of the rerun so far
+    def record(self, **fields):
+        return {
+            'time': self.started_at,
+            **fields,
+            'total_ms': (self.clock() - self.start) * 1000,
+            'stages': [{'name': name, 'ms': seconds * 1000} for name, seconds in self.stages],
+            'caches': [{'name': name, 'hit': hit} for name, hit in self.caches],
+            'payloads': [{'name': name, 'bytes': size} for name, size in self.payloads],
+        }
+
+
+def to_jsonl(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+# Append records to a JSON lines file, shared by every session of the process
+log_lock = threading.Lock()
+
+
+def append_jsonl(path, records):
+    with log_lock, open(path, 'a') as f:
+        f.write(to_jsonl(records))
@@ -0,0 +1,196 @@
+import threading
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+import dashboard_data
+import snapshots
+
+# Optional SQL engine for the dashboard, switched on with `mode = "sql"` under `[engine]` in secrets.toml
+# The processed worksheets are loaded once per data version into an embedded DuckDB database. Rollups, county joins and
+# table filters and sorts then run there as SQL, with the filters pushed down into the table scans, and only their
+# result sets come back as DataFrames. This only swaps the engine of those queries: the worksheets stay in memory as
+# DataFrames too (the cache, the charts and the rows shown or exported are taken from them), so the database is held on top.
+# Results are the same as the pandas path (dashboard_data.build_rollups and dashboard_tables.TableSource), which stays
+# the default. Sums use FSUM, a compensated sum like pandas' groupby sums, so they don't depend on the order rows are added in.
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+# One DuckDB database holding the worksheets of one data version, as tables named after the worksheets
+# Every row keeps its position in the worksheet in a row_id column.
+class SqlEngine:
+    def __init__(self, worksheets, database=':memory:', memory_limit=None):
+        import duckdb  # optional dependency, only needed in SQL mode
+        self.connection = duckdb.connect(database)
+        if memory_limit:
+            self.connection.execute(f"SET memory_limit = '{memory_limit}'")
+        self.lock = threading.Lock()
+        self.mixed = {}  # worksheet -> columns mixing numbers and text, stored as text (like the snapshots)
+        self.dtypes = {}  # worksheet -> pandas dtype of each column, to give results the dtypes pandas would
+        for name, data in worksheets.items():
+            if data.empty:
+                continue
+            self.mixed[name] = snapshots.mixed_columns(data)
+            self.dtypes[name] = data.dtypes
+            table = snapshots.arrow_safe(data, self.mixed[name]).assign(row_id=np.arange(len(data)))
+            self.connection.register('incoming', table)
+            self.connection.execute(f"CREATE OR REPLACE TABLE {quote(name)} AS SELECT * FROM incoming")
+            self.connection.unregister('incoming')
+
+    def __contains__(self, name):
+        return name in self.mixed
+
+    # Run a query on its own cursor (so sessions can query at once) and return the result as a DataFrame
+    # `frames` are registered as views for the query, e.g. small lookup tables to join against
+    def query(self, sql, params=None, **frames):
+        with self.lock:
+            cursor = self.connection.cursor()
+        try:
+            for name, frame in frames.items():
+                cursor.register(name, frame)
+            return cursor.execute(sql, params or []).df()
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.connection.close()
+
+
+# Sum of `columns` per value of `dimension` (like dashboard_data.sum_by), or per canonical name with a NameIndex
+def sum_by(engine, table, dimension, columns, index=None):
+    sums = ', '.join(f"COALESCE(FSUM({quote(column)}), 0) AS {quote(column)}" for column in columns)
+    if index is None:
+        result = engine.query(f"SELECT {quote(dimension)}, {sums} FROM {quote(table)} "
+                              f"WHERE {quote(dimension)} IS NOT NULL GROUP BY ALL ORDER BY 1")
+        return result.astype({dimension: engine.dtypes[table][dimension]})
+    names = pd.DataFrame(list(index.canonical.items()), columns=['raw', 'canonical'])
+    result = engine.query(f"SELECT names.canonical AS {quote(dimension)}, {sums} FROM {quote(table)} AS source "
+                          f"JOIN names ON TRIM(CAST(source.{quote(dimension)} AS VARCHAR)) = names.raw GROUP BY ALL ORDER BY 1",
+                          names=names)
+    return result.assign(**{dimension: pd.Categorical(result[dimension].to_numpy(dtype=object))})
+
+
+# Each location's county (dashboard_data.get_county), for every location in the table
+def location_counties(engine, table, location_column):
+    locations = engine.query(f"SELECT DISTINCT CAST({quote(location_column)} AS VARCHAR) AS location_name FROM {quote(table)}")
+    return locations.assign(county_name=locations['location_name'].map(dashboard_data.get_county))
+
+
+# dashboard_data.prepare_data in SQL: the totals of every county, 0 for counties without any row, in the order of all_counties_df
+# Rows are summed per county straight from the table instead of from the per-location totals
+def county_totals(engine, table, location_column, aggregates, all_counties_df):
+    counties = all_counties_df[['County']].assign(position=np.arange(len(all_counties_df)))
+    selected = ', '.join(f"{expression} AS {quote(column)}" for column, expression in aggregates.items())
+    filled = ', '.join(f"CAST(COALESCE(totals.{quote(column)}, 0) AS DOUBLE) AS {quote(column)}" for column in aggregates)
+    result = engine.query(f"""
+        SELECT counties.County, {filled}
+        FROM counties
+        LEFT JOIN (SELECT locations.county_name AS County, {selected}
+                   FROM {quote(table)} AS source JOIN locations ON CAST(source.{quote(location_column)} AS VARCHAR) = locations.location_name
+                   GROUP BY ALL) AS totals USING (County)
+        ORDER BY counties.position""",
+        counties=counties, locations=location_counties(engine, table, location_column))
+    return result.assign(County=result['County'].astype(all_counties_df['County'].dtype))
+
+
+def total(engine, table, column):
+    return engine.query(f"SELECT COALESCE(FSUM({quote(column)}), 0) AS total FROM {quote(table)}")['total'].iloc[0]
+
+
+# dashboard_data.build_rollups, run as SQL against the engine's tables
+def build_rollups(engine, all_counties_df, stage=lambda name: nullcontext(), name_indexes=None):
+    name_indexes = name_indexes or {}
+    rollups = {'totals': {}}
+    if 'TechInventory' in engine:
+        with stage('rollups/server groupby'):
+            rollups['totals']['storage_value'] = total(engine, 'TechInventory', 'Total Value')
+            rollups['server_by_section'] = sum_by(engine, 'TechInventory', 'Combined_Section', ['Total Value'])
+    if 'FullPhones' in engine:
+        with stage('rollups/phone groupby'):
+            rollups['totals']['annual_phone_bill'] = total(engine, 'FullPhones', 'Annual Phone Bill')
+            rollups['totals']['phones_value'] = total(engine, 'FullPhones', 'Estimated Price')
+            by_location = engine.query(
+                'SELECT "Location", COUNT(*) AS "Number of Phones", COALESCE(FSUM("Annual Phone Bill"), 0) AS "Annual Phone Bill", '
+                'COALESCE(FSUM("Estimated Price"), 0) AS "Estimated Price" FROM "FullPhones" '
+                'WHERE "Location" IS NOT NULL GROUP BY ALL ORDER BY 1')
+            rollups['phones_by_location'] = by_location.astype({'Location': engine.dtypes['FullPhones']['Location']})
+            administration = engine.query(
+                'SELECT CASE CAST("Administration" AS VARCHAR) WHEN \'Y\' THEN \'Yes\' WHEN \'N\' THEN \'No\' END AS "Administration", '
+                'COALESCE(FSUM("Annual Phone Bill"), 0) AS "Annual Phone Bill" FROM "FullPhones" '
+                'GROUP BY ALL HAVING "Administration" IS NOT NULL ORDER BY 1')
+            rollups['phones_by_administration'] = administration.astype({'Administration': str})
+        with stage('rollups/phone prepare_data'):
+            rollups['phones_by_county'] = county_totals(engine, 'FullPhones', 'Location', {
+                'Number of Phones': 'COUNT(*)',
+                'Annual Phone Bill': 'FSUM("Annual Phone Bill")',
+                'Estimated Price': 'FSUM("Estimated Price")',
+            }, all_counties_df)
+    if 'StationaryTech' in engine:
+        with stage('rollups/workstation groupby'):
+            rollups['totals']['stationary_value'] = total(engine, 'StationaryTech', 'Estimated Price')
+            rollups['stationary_by_device'] = sum_by(engine, 'StationaryTech', 'Device', ['Estimated Price'], name_indexes.get('Device'))
+            rollups['stationary_by_warehouse'] = sum_by(engine, 'StationaryTech', 'Warehouse', ['Estimated Price'])
+            rollups['stationary_by_department'] = sum_by(engine, 'StationaryTech', 'Department', ['Estimated Price'])
+        with stage('rollups/workstation prepare_data'):
+            rollups['stationary_by_county'] = county_totals(engine, 'StationaryTech', 'Warehouse', {
+                'Estimated Price': 'FSUM("Estimated Price")',
+            }, all_counties_df)
+    # Every county metric side by side, for the single multi-metric choropleth (small result sets, merged as in pandas)
+    with stage('rollups/county merge'):
+        county_metrics = all_counties_df
+        if 'phones_by_county' in rollups:
+            county_metrics = county_metrics.merge(rollups['phones_by_county'].rename(columns={'Estimated Price': 'Phone Valuation'}), on='County')
+        if 'stationary_by_county' in rollups:
+            county_metrics = county_metrics.merge(rollups['stationary_by_county'].rename(columns={'Estimated Price': 'Workstation Valuation'}), on='County')
+    rollups['county_metrics'] = county_metrics
+    return rollups
+
+
+# dashboard_tables.TableSource answered by the SQL engine: filters and sorts run as a query returning row positions,
+# and the rows shown or exported are then taken from `data` (the worksheet as displayed, e.g. anonymized),
+# so pages and exports are the same as with the pandas path
+class SqlTableSource:
+    def __init__(self, engine, table, data):
+        self.engine = engine
+        self.table = table
+        self.data = data.reset_index(drop=True)
+        self.value_lists = {}  # column -> its values in the order they first appear
+        self.sorted_options = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def values(self, column):
+        if column not in self.value_lists:
+            result = self.engine.query(f"SELECT CAST({quote(column)} AS VARCHAR) AS value FROM {quote(self.table)} "
+                                       f"GROUP BY ALL ORDER BY MIN(row_id)")
+            self.value_lists[column] = [str(value) for value in result['value']]
+        return self.value_lists[column]
+
+    def options(self, column):
+        if column not in self.sorted_options:
+            self.sorted_options[column] = sorted(self.values(column))
+        return self.sorted_options[column]
+
+    # Sort key of a column: mixed columns are sorted as text, like TableSource does, and missing values come last
+    def sort_key(self, column, ascending=True):
+        key = f"CAST({quote(column)} AS VARCHAR)" if column in self.engine.mixed[self.table] else quote(column)
+        return f"{key} {'ASC' if ascending else 'DESC'} NULLS LAST"
+
+    # Same filters and order as TableSource.rows
+    def rows(self, filters=None, sort_by=None, ascending=True):
+        conditions, params = [], []
+        for column, value in (filters or {}).items():
+            if value is None or value == 'All' or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            values = [str(item) for item in value] if isinstance(value, (list, tuple, set)) else [str(value)]
+            conditions.append(f"CAST({quote(column)} AS VARCHAR) IN ({', '.join('?' * len(values))})")
+            params += values
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = f"{self.sort_key(sort_by, ascending)}, row_id" if sort_by is not None else 'row_id'
+        return self.engine.query(f"SELECT row_id FROM {quote(self.table)} {where} ORDER BY {order}", params)['row_id'].to_numpy(dtype=np.intp)
+
+    def take(self, rows):
+        return self.data.iloc[rows]
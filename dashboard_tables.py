@@ -0,0 +1,78 @@
+import math
+import numpy as np
+
+# Server-side data source for the inventory tables
+# Filters, sorts and pages are answered from per-column indexes built once per data version,
+# so only the visible page is ever handed to the grid in the browser.
+class TableSource:
+    def __init__(self, data, index_columns=()):
+        self.data = data.reset_index(drop=True)
+        self.positions = {column: self.build_positions(column) for column in index_columns}
+        self.ranks = {}  # (column, ascending) -> rank of every row in that sort order, built on first use
+        self.sorted_options = {}  # column -> its values in alphabetical order, for filter option lists
+
+    def __len__(self):
+        return len(self.data)
+
+    # Row positions of every value of a column: {value: sorted array of row positions}
+    def build_positions(self, column):
+        groups = self.data.groupby(self.data[column].astype(str), observed=True, sort=False).indices
+        return {value: np.sort(positions) for value, positions in groups.items()}
+
+    def index(self, column):
+        if column not in self.positions:
+            self.positions[column] = self.build_positions(column)
+        return self.positions[column]
+
+    # Values of a column in the order they first appear
+    def values(self, column):
+        return list(self.index(column))
+
+    def options(self, column):
+        if column not in self.sorted_options:
+            self.sorted_options[column] = sorted(self.index(column))
+        return self.sorted_options[column]
+
+    # Row positions where the column holds the value, or any of the values if a list is given
+    def rows_for(self, column, value):
+        index = self.index(column)
+        if isinstance(value, (list, tuple, set)):
+            matches = [index[str(item)] for item in value if str(item) in index]
+            return np.sort(np.concatenate(matches)) if matches else np.array([], dtype=np.intp)  # values never share a row
+        return index.get(str(value), np.array([], dtype=np.intp))
+
+    # Missing values sort last in both directions; equal values keep their row order
+    def rank(self, column, ascending=True):
+        if (column, ascending) not in self.ranks:
+            values = self.data[column]
+            try:
+                order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+            except TypeError:  # mixed numbers and text, e.g. blanks in a number column
+                order = values.astype(str).sort_values(ascending=ascending, kind='stable').index.to_numpy()
+            rank = np.empty(len(order), dtype=np.intp)
+            rank[order] = np.arange(len(order))
+            self.ranks[column, ascending] = rank
+        return self.ranks[column, ascending]
+
+    # Row positions matching every (column, value) filter, in sort order
+    # Filters on different columns are combined with AND; a list of values for one column means any of them.
+    # A filter value of None, 'All' or an empty list means no filter on that column.
+    def rows(self, filters=None, sort_by=None, ascending=True):
+        rows = None
+        for column, value in (filters or {}).items():
+            if value is None or value == 'All' or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            matches = self.rows_for(column, value)
+            rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self.data))
+        if sort_by is not None:
+            rows = rows[np.argsort(self.rank(sort_by, ascending)[rows], kind='stable')]
+        return rows
+
+    def take(self, rows):
+        return self.data.iloc[rows]
+
+
+def page_count(total_rows, page_size):
+    return max(1, math.ceil(total_rows / page_size))
@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from collections import deque
+import requests
+from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol, numericise_all, to_records
+
+# Local stand-in for a gspread client, used by the benchmarks instead of the real Google Sheets API
+# Each call that would be an HTTP request sleeps for `latency` seconds and is counted in `requests`
+# Failures can be injected: `failures` lists the HTTP statuses the next requests fail with (200 lets one through; 502
+# answers with an HTML page, like Google's front end) or exceptions they raise (e.g. requests.ConnectionError()),
+# and with `quota` = (requests, seconds) the requests over that rate are rejected with 429, like the Sheets API does.
+
+
+# The APIError gspread raises for an error answer of the API (or, with html=True, of Google's front end)
+def api_error(status, message, html=False):
+    response = requests.Response()
+    response.status_code = status
+    if html:
+        response._content = f"<html><body><h1>{status}</h1><p>{message}</p></body></html>".encode()
+    else:
+        response._content = json.dumps({'error': {'code': status, 'message': message, 'status': 'ERROR'}}).encode()
+    return APIError(response)
+
+
+# What the Sheets API stores for a value typed in by a user: a number if it reads as one, else the text
+def user_entered(value):
+    try:
+        number = float(str(value).replace(',', '').lstrip('$'))
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() and abs(number) < 2 ** 53 else number
+
+
+class FakeClient:
+    def __init__(self, worksheets, latency=0.0, failures=(), quota=None, clock=time.monotonic):
+        self.worksheets = worksheets  # {worksheet name: list of rows, header row first}
+        self.latency = latency
+        self.requests = 0
+        self.modified = 0  # stands in for the Drive modifiedTime of the spreadsheet
+        self.cells_written = 0
+        self.grids = {}  # {worksheet name: [rows, columns]} of the grid, which new Google sheets start at 1000 x 26
+        self.failures = deque(failures)
+        self.quota = quota
+        self.clock = clock
+        self.accepted = deque()  # times of the requests accepted within the quota period
+        self.rejected = 0
+        self.concurrent = 0  # requests being answered right now, and the most seen at once
+        self.max_concurrent = 0
+        self.lock = threading.Lock()
+
+    def request(self):
+        with self.lock:
+            self.requests += 1
+            status = self.failures.popleft() if self.failures else 200
+            if status == 200 and self.quota is not None:
+                limit, period = self.quota
+                now = self.clock()
+                while self.accepted and self.accepted[0] <= now - period:
+                    self.accepted.popleft()
+                if len(self.accepted) >= limit:
+                    status = 429
+                else:
+                    self.accepted.append(now)
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+        finally:
+            with self.lock:
+                self.concurrent -= 1
+        if status == 200:
+            return
+        with self.lock:
+            self.rejected += 1
+        if isinstance(status, Exception):
+            raise status
+        if status == 429:
+            raise api_error(429, "Quota exceeded for quota metric 'Read requests'")
+        if status == 502:
+            raise api_error(502, "The server encountered a temporary error.", html=True)
+        raise api_error(status, "The service is currently unavailable.")
+
+    # Replace the contents of a worksheet, as if someone edited the sheet
+    def update_worksheet(self, title, values):
+        self.worksheets[title] = values
+        self.modified += 1
+
+    def open(self, title):
+        self.request()  # Drive lookup of the spreadsheet by title
+        return FakeSpreadsheet(self, title)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+        self.id = title
+
+    def worksheet(self, title):
+        self.client.request()  # gspread fetches the spreadsheet metadata to find the worksheet
+        return FakeWorksheet(self.client, title, self.id)
+
+    def get_lastUpdateTime(self):
+        self.client.request()  # Drive files.get metadata request
+        return f"2024-01-01T00:00:{self.client.modified:02d}.000Z"
+
+    def values_batch_get(self, ranges, params=None):
+        self.client.request()
+        value_ranges = []
+        for range_name in ranges:
+            title = range_name.split('!')[0].strip("'")
+            value_ranges.append({'range': range_name, 'values': [[str(value) for value in row] for row in self.client.worksheets[title]]})
+        return {'spreadsheetId': self.title, 'valueRanges': value_ranges}
+
+
+class FakeWorksheet:
+    def __init__(self, client, title, spreadsheet_id):
+        self.client = client
+        self.title = title
+        self.spreadsheet_id = spreadsheet_id
+
+    def get_all_records(self):
+        self.client.request()
+        values = self.client.worksheets[self.title]
+        if not values:
+            return []
+        return to_records(values[0], [numericise_all([str(value) for value in row]) for row in values[1:]])
+
+    def get_all_values(self, **kwargs):
+        self.client.request()
+        return [[str(value) for value in row] for row in self.client.worksheets.get(self.title, [])]
+
+    def grid(self):
+        values = self.client.worksheets.get(self.title, [])
+        grid = self.client.grids.setdefault(self.title, [1000, 26])
+        grid[0] = max(grid[0], len(values))
+        grid[1] = max(grid[1], max((len(row) for row in values), default=0))
+        return grid
+
+    @property
+    def row_count(self):
+        return self.grid()[0]
+
+    @property
+    def col_count(self):
+        return self.grid()[1]
+
+    def add_rows(self, rows):
+        self.client.request()
+        self.grid()[0] += rows
+
+    def add_cols(self, cols):
+        self.client.request()
+        self.grid()[1] += cols
+
+    # Write each {'range': 'A2:N5', 'values': rows} into the stored rows, growing them as needed
+    # Like the Sheets API, writing past the grid fails, and USER_ENTERED parses numbers (as doubles, so long digit
+    # strings lose their last digits) while RAW stores the text as given
+    def batch_update(self, data, value_input_option=None):
+        self.client.request()
+        rows, cols = self.grid()
+        values = [list(row) for row in self.client.worksheets.get(self.title, [])]
+        for update in data:
+            (first_row, first_col), _ = [a1_to_rowcol(cell) for cell in update['range'].split(':')]
+            if first_row - 1 + len(update['values']) > rows or first_col - 1 + max(map(len, update['values']), default=0) > cols:
+                raise api_error(400, f"Range ({self.title}!{update['range']}) exceeds grid limits. Max rows: {rows}, max columns: {cols}")
+            for i, row in enumerate(update['values']):
+                if value_input_option == 'USER_ENTERED':
+                    row = [user_entered(value) for value in row]
+                while len(values) < first_row + i:
+                    values.append([])
+                target = values[first_row + i - 1]
+                target.extend([''] * (first_col - 1 + len(row) - len(target)))
+                target[first_col - 1:first_col - 1 + len(row)] = row
+                self.client.cells_written += len(row)
+        while values and not any(str(value) for value in values[-1]):
+            values.pop()  # blanked rows at the end are gone, as far as reads are concerned
+        self.client.update_worksheet(self.title, values)
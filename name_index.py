@@ -0,0 +1,98 @@
+import math
+import re
+from collections import Counter, defaultdict
+import numpy as np
+import pandas as pd
+
+# Canonical product names for free-text equipment names (Equipment Model, Item, Device)
+# 'Lenovo 100e Chromebook' and 'Lenovo 100e Chromebook Gen3 4GB RAM 32GB EMMC' are the same product; 'Galaxy Tabs'
+# and 'Galaxy Tab Chargers with Bricks' are not. Names are split into tokens and scored by weighted Jaccard similarity,
+# where a token's weight is its rarity among the names (brand words shared by everything count little) and spec tokens
+# (storage, RAM, generation, 5G...) count a tenth, so variants of one product differ by little and different products by a lot.
+# Names are never compared pairwise: a product scoring above the threshold must share one of the few heaviest tokens
+# of a name (those weighing more than 1 - threshold of it), so a name is only scored against the products holding those.
+THRESHOLD = 0.75  # similarity from which a name is folded into a product
+SPEC_WEIGHT = 0.1
+STOPWORDS = {'A', 'AN', 'AND', 'FOR', 'IN', 'OF', 'THE', 'WITH'}
+SPEC_TOKEN = re.compile(r'^(\d+(GB|TB|MB|W|MP|GHZ|MHZ|FT|MM|IN)|GEN\d*|RAM|EMMC|SSD|HDD|[45]G|LTE|UW)$')
+
+
+# Upper case, punctuation removed, sizes glued to their unit ('128 GB' -> '128GB')
+# A '+' right after a model number stays part of it ('S21+' -> 'S21PLUS'), since the S21+ is another phone than the S21
+def normalize_name(name):
+    name = re.sub(r'(?<=[A-Z0-9])\+', 'PLUS', str(name).upper())
+    name = re.sub(r'[^A-Z0-9]+', ' ', name).strip()
+    return re.sub(r'\b(\d+) (GB|TB|MB|W|MP|GHZ|MHZ|FT|MM)\b', r'\1\2', name)
+
+
+# Set of tokens of a normalized name, without stopwords
+# Plurals are not folded: 'Galaxy Tabs in black case' (tablets) and 'Black Galaxy Tab Cases' (cases) would become the same tokens
+def name_tokens(normalized):
+    return frozenset(token for token in normalized.split() if token not in STOPWORDS)
+
+
+class NameIndex:
+    # `names`: the raw names (one per row, so the most common spelling of a product becomes its canonical name)
+    def __init__(self, names, threshold=THRESHOLD):
+        self.threshold = threshold
+        counts = Counter(str(name).strip() for name in names if pd.notna(name))
+        counts.pop('', None)
+        # Spellings that normalize to the same text are one name from here on; the most common spelling represents it
+        spellings = defaultdict(Counter)
+        for name, count in counts.items():
+            spellings[normalize_name(name)][name] += count
+        tokens = {normalized: name_tokens(normalized) for normalized in spellings}
+        document_counts = Counter(token for token_set in tokens.values() for token in token_set)
+        self.weights = {token: math.log(1 + len(tokens) / count) * (SPEC_WEIGHT if SPEC_TOKEN.match(token) else 1)
+                        for token, count in document_counts.items()}
+
+        # Most common names first, then the shortest, so a product is named after its usual, plainest spelling
+        order = sorted(spellings, key=lambda normalized: (-sum(spellings[normalized].values()), len(tokens[normalized]), normalized))
+        products = []  # (token set, total weight) of each product's first name
+        blocks = defaultdict(list)  # token -> products holding it
+        product_of = {}  # normalized name -> product number
+        for normalized in order:
+            token_set = tokens[normalized]
+            weight = self.total(token_set)
+            heaviest = sorted(token_set, key=lambda token: (-self.weights[token], token))
+            candidates, remaining = set(), weight
+            for token in heaviest:
+                if remaining < threshold * weight:
+                    break
+                candidates.update(blocks[token])
+                remaining -= self.weights[token]
+            best, best_score = None, threshold
+            for product in candidates:
+                product_tokens, product_weight = products[product]
+                if min(weight, product_weight) < best_score * max(weight, product_weight):
+                    continue  # too different in size to reach the threshold
+                shared = self.total(token_set & product_tokens)
+                score = shared / (weight + product_weight - shared)
+                if score >= best_score:
+                    best, best_score = product, score
+            if best is None:
+                best = len(products)
+                products.append((token_set, weight))
+                for token in token_set:
+                    blocks[token].append(best)
+            product_of[normalized] = best
+
+        names_of = [None] * len(products)
+        for normalized in order:
+            if names_of[product_of[normalized]] is None:
+                names_of[product_of[normalized]] = spellings[normalized].most_common(1)[0][0]
+        # raw name -> canonical product name
+        self.canonical = {name: names_of[product_of[normalized]]
+                          for normalized, names in spellings.items() for name in names}
+
+    def total(self, token_set):
+        return sum(self.weights[token] for token in token_set)
+
+    def __len__(self):
+        return len(set(self.canonical.values()))
+
+    # Canonical name of every value (as a categorical); values the index has not seen are kept as they are
+    def map(self, values):
+        codes, uniques = pd.factorize(values)
+        canonical = np.array([self.canonical.get(str(value).strip(), value) for value in uniques] + [None], dtype=object)
+        return pd.Series(pd.Categorical(canonical[codes]), index=values.index)  # code -1 (missing value) picks the trailing None
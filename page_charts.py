@@ -0,0 +1,252 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+import county_geometry
+import dashboard_data
+import dashboard_figures
+import dashboard_memory
+import dashboard_page
+import dashboard_sql
+
+# The Charts page: summary cards, the storage, phone and workstation charts, and the county heatmap
+# Streamlit only runs this page (and imports plotly) when it is first opened.
+
+
+# Load the simplified county outlines (see county_geometry.py)
+# (cache_resource, not cache_data: every session shares this one read-only object instead of getting its own copy)
+@st.cache_resource(show_spinner=False)
+def load_county_levels(_profiler):
+    _profiler.miss('county outlines')
+    return county_geometry.load_levels()
+
+
+# All chart and choropleth rollups, computed once per data version and shared (read-only) by every session and rerun
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_rollups(version, _worksheets, _run, _all_counties_df):
+    _run.profiler.miss('rollups')
+    name_indexes = _run.name_indexes(_worksheets)
+    if dashboard_page.sql_mode():
+        return dashboard_memory.freeze(dashboard_sql.build_rollups(_run.sql_engine(_worksheets), _all_counties_df, stage=_run.profiler.stage,
+                                                                   name_indexes=name_indexes))
+    return dashboard_memory.freeze(dashboard_data.build_rollups(_worksheets.get('TechInventory', pd.DataFrame()),
+                                                                _worksheets.get('FullPhones', pd.DataFrame()),
+                                                                _worksheets.get('StationaryTech', pd.DataFrame()),
+                                                                _all_counties_df, stage=_run.profiler.stage, name_indexes=name_indexes))
+
+
+# Built figures are cached per (data version, chart, widget selection) and shared by every session,
+# so a widget only rebuilds its own chart
+@st.cache_resource
+def get_figure_cache():
+    return dashboard_figures.FigureCache()
+
+
+run = dashboard_page.PageRun("Charts")
+
+# Use the coarsest level of the county outlines that still looks exact at chart size
+with run.profiler.cached('county outlines'):
+    county_levels = load_county_levels(run.profiler)
+map_level = st.secrets.get("maps", {}).get("level", county_geometry.pick_level(county_levels))
+geojson = county_levels['levels'][map_level]
+
+#all_counties = ["Abbeville", "Aiken", "Allendale", "Anderson", "Bamberg", "Barnwell", "Beaufort", "Berkeley", "Calhoun", "Charleston", "Cherokee", "Chester", "Chesterfield", "Clarendon", "Colleton", "Darlington", "Dillon", "Dorchester", "Edgefield", "Fairfield", "Florence", "Georgetown", "Greenville", "Greenwood", "Hampton", "Horry", "Jasper", "Kershaw", "Lancaster", "Laurens", "Lee", "Lexington", "McCormick", "Marion", "Marlboro", "Newberry", "Oconee", "Orangeburg", "Pickens", "Richland", "Saluda", "Spartanburg", "Sumter", "Union", "Williamsburg", "York"]
+all_counties = county_levels['counties']
+
+# Convert this list into a DataFrame
+all_counties_df = pd.DataFrame(all_counties, columns=['County'])
+
+def rollups_for(worksheets):
+    with run.profiler.cached('rollups'):
+        return get_rollups(worksheets.version, worksheets, run, all_counties_df)
+
+figure_cache = get_figure_cache()
+run.figure_report = dashboard_figures.FigureReport()
+
+# Summary Cards, first on the page: each card shows "…" until its worksheet is ready
+col1, col2, col3 = st.columns(3)
+col4, col5, col6, = st.columns(3)
+cards = {
+    'TechInventory': [(col3.empty(), "Total Storage Value", 'storage_value')],
+    'FullPhones': [(col1.empty(), "Total Phone Value", 'phones_value'), (col5.empty(), "Total Annual Phone Bills", 'annual_phone_bill')],
+    'StationaryTech': [(col2.empty(), "Total Workstation Device Value", 'stationary_value')],
+}
+
+def summary_cards(worksheet_name):
+    def draw(worksheets):
+        if worksheets.get(worksheet_name, pd.DataFrame()).empty:
+            for placeholder, _, _ in cards[worksheet_name]:
+                placeholder.empty()
+            return
+        totals = rollups_for(worksheets)['totals']
+        for placeholder, label, total in cards[worksheet_name]:
+            placeholder.metric(label, f"${totals[total]:,.2f}", delta_color="off")
+
+    def waiting():
+        for placeholder, label, _ in cards[worksheet_name]:
+            placeholder.metric(label, "…")
+    return [worksheet_name], draw, waiting
+
+def show_chart(worksheets, chart_id, selection, build):
+    with run.profiler.stage(f'chart {chart_id}'):
+        figure = figure_cache.get((worksheets.version, map_level), chart_id, selection, build, report=run.figure_report)
+        st.plotly_chart(figure)
+    run.profiler.cache(f'chart {chart_id}', run.figure_report.rows[-1]['Cached'])
+    if run.profiler.enabled:
+        run.profiler.payload(f'chart {chart_id}', len(pio.to_json(figure, validate=False))) # about what Streamlit sends for it
+
+def storage_charts(worksheets):
+    if worksheets.get('TechInventory', pd.DataFrame()).empty:
+        return
+    rollups = rollups_for(worksheets)
+    chart_style = st.radio("Select Chart Style for Storage Value by Category:",
+                        ('Bar Chart', 'Pie Chart'))
+
+    def build_server_value():
+        if chart_style == 'Bar Chart':
+            return px.bar(rollups['server_by_section'],
+                        x='Combined_Section', y='Total Value', title="Storage Value by Category",
+                        labels={'Combined_Section': 'Category'},
+                        color='Combined_Section',
+                        color_discrete_sequence=px.colors.sequential.Sunsetdark)
+        return px.pie(rollups['server_by_section'], values='Total Value', names='Combined_Section',
+                    title="Storage Value by Category",
+                    color_discrete_sequence=px.colors.sequential.Sunsetdark)
+
+    show_chart(worksheets, 'server_value', chart_style, build_server_value)
+
+def phone_charts(worksheets):
+    if worksheets.get('FullPhones', pd.DataFrame()).empty:
+        return
+    rollups = rollups_for(worksheets)
+    location_colors = [
+        "#c7e9c0",  # light green
+        "#41ab5d",  # medium green
+        "#006d2c",  # dark green
+        "#00441b"   # darker green
+    ]
+    #random.shuffle(location_colors)
+    admin_colors = [
+        "#9ecae1",  # light blue
+        "#08519c"   # dark blue
+    ]
+    #random.shuffle(admin_colors)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        show_chart(worksheets, 'subscription_by_location', None, lambda: px.pie(
+            rollups['phones_by_location'], values='Annual Phone Bill', names='Location',
+            title="Subscription Cost by Location",
+            color_discrete_sequence=location_colors))
+    with col2:
+        show_chart(worksheets, 'subscription_by_administration', None, lambda: px.pie(
+            rollups['phones_by_administration'],
+            values='Annual Phone Bill', names='Administration',
+            title="Subscription Cost by Administration",
+            color_discrete_sequence=admin_colors))
+
+def workstation_charts(worksheets):
+    if worksheets.get('StationaryTech', pd.DataFrame()).empty:
+        return
+    rollups = rollups_for(worksheets)
+    chart_type = st.radio(
+        "Select Chart Style for Total Value by Device Type:",
+        ('Bar Chart', 'Pie Chart')
+    )
+    brown_yellow_palette = [
+        "#FFF59D",  # soft yellow
+        "#6D4C41",   # dark brown
+        "#F57F17",  # amber
+        "#FBC02D",  # dark yellow
+        "#FFF9C4",  # lighter yellow
+        "#BCAAA4",  # light brown
+        "#FFFDE7",  # lightest yellow
+        "#FDD835",  # mustard yellow
+        "#795548",  # medium dark brown
+        "#FFF176",  # soft yellow
+        "#F9A825",  # yellowish brown
+        "#A1887F",  # medium light brown
+        "#8D6E63",  # medium brown
+        "#FFEE58",  # sunny yellow
+        "#FFEB3B"  # bright yellow
+    ]
+    #random.shuffle(brown_yellow_palette)
+
+    def build_device_value():
+        if chart_type == 'Bar Chart':
+            return px.bar(
+                rollups['stationary_by_device'],
+                x='Device', 
+                y='Estimated Price', 
+                title="Total Value by Device Type",
+                labels={'Estimated Price': 'Total Price', 'Device': 'Device Type'},
+                color='Device',
+                color_discrete_sequence=brown_yellow_palette
+            )
+        return px.pie(
+            rollups['stationary_by_device'], 
+            values='Estimated Price', 
+            names='Device', 
+            title="Total Value by Device Type",
+            labels={'Estimated Price': 'Total Value'},
+            color_discrete_sequence=brown_yellow_palette
+        )
+
+    show_chart(worksheets, 'device_value', chart_type, build_device_value)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        show_chart(worksheets, 'warehouse_value', None, lambda: px.pie(
+            rollups['stationary_by_warehouse'],
+            values='Estimated Price', 
+            names='Warehouse', 
+            title="Workstation Device Value by Warehouse",
+            labels={'Estimated Price': 'Total Value'},
+            color_discrete_sequence=px.colors.sequential.Darkmint
+        ))
+
+    with col2:
+        show_chart(worksheets, 'department_value', None, lambda: px.pie(
+            rollups['stationary_by_department'],
+            values='Estimated Price', 
+            names='Department', 
+            title="Workstation Device Value by Department",
+            labels={'Estimated Price': 'Total Value'},
+            color_discrete_sequence=px.colors.sequential.Emrld
+        ))
+
+# One heatmap for every county metric; the buttons above it switch metrics in the browser without a rerun
+# Every location is mapped to its county (Columbia -> Richland), and counties without data are set to 0
+def county_heatmap(worksheets):
+    heatmap_metrics = []
+    if not worksheets.get('FullPhones', pd.DataFrame()).empty:
+        heatmap_metrics += [
+            ('Number of Phones', 'Number of Phones', "Number of Phones by Warehouse", ',.0f'),
+            ('Annual Phone Bill', 'Annual Phone Bill', "Annual Phone Bill by Warehouse", '$,.2f'),
+            ('Phone Valuation', 'Phone Valuation', "Phone Valuation by Warehouse", '$,.2f'),
+        ]
+    if not worksheets.get('StationaryTech', pd.DataFrame()).empty:
+        heatmap_metrics.append(('Workstation Valuation', 'Workstation Valuation', "Workstation Valuation by Warehouse", '$,.2f'))
+
+    # Good color scales: YlOrRd, YlGnBu, Cividis, Portland
+    scheme = "YlGnBu"
+    if heatmap_metrics:
+        rollups = rollups_for(worksheets)
+        show_chart(worksheets, 'county_heatmap', None, lambda: dashboard_figures.build_metric_choropleth(
+            rollups['county_metrics'], geojson, heatmap_metrics, scheme,
+            geo_ranges=county_geometry.geo_ranges(county_levels))) # precomputed bounds instead of fitbounds="locations"
+
+
+# The page, top to bottom. Cards come first and need one worksheet each; the heatmap waits for the phone and
+# workstation data it combines
+sections = [summary_cards(name) for name in cards]
+sections += [
+    run.placeholder_section(['TechInventory'], 'storage charts', storage_charts, "Loading storage charts…"),
+    run.placeholder_section(['FullPhones'], 'phone charts', phone_charts, "Loading phone charts…"),
+    run.placeholder_section(['StationaryTech'], 'workstation charts', workstation_charts, "Loading workstation charts…"),
+    run.placeholder_section(['FullPhones', 'StationaryTech'], 'county heatmap', county_heatmap, "Loading county heatmap…"),
+]
+run.show(sections)
+
+run.footer(lambda: [('Rollups', rollups_for(run.worksheets)), ('County outlines', county_levels), ('Chart cache', figure_cache.figures)])
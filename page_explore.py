@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import secrets
+import streamlit as st
+import pandas as pd
+from st_aggrid import AgGrid, GridOptionsBuilder
+import dashboard_data
+import dashboard_exports
+import dashboard_page
+import dashboard_sql
+import dashboard_tables
+
+# The Explore Data page: the phone, server equipment and workstation tables, with their filters and downloads
+# Streamlit only runs this page (and imports st_aggrid) when it is first opened.
+
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource
+def get_export_cache():
+    return dashboard_exports.ExportCache()
+
+# Random key used when secrets.toml has no [anonymization] key: generated once per process, so pseudonyms stay
+# stable across reruns and sessions but change when the app restarts
+@st.cache_resource
+def get_fallback_anonymization_key():
+    logger.warning("No [anonymization] key is configured: phone pseudonyms will change when the app restarts")
+    return secrets.token_bytes(32)
+
+
+run = dashboard_page.PageRun("Explore Data")
+
+# Anonymized phone view for users without sufficient clearance
+# Built once per data version and shared by every low clearance session; pseudonyms are stable across reruns and sessions
+# The key must be a random string of its own: anyone who knows a real value can read its pseudonym and guess the key offline
+def build_anonymized_phones(data):
+    run.profiler.miss('anonymized phones')
+    anonymization = st.secrets.get("anonymization", {})
+    columns = {column: label for column, label in dashboard_data.ANONYMIZED_COLUMNS.items()
+               if column in anonymization.get("columns", dashboard_data.ANONYMIZED_COLUMNS)}
+    return dashboard_data.anonymize(data, anonymization.get("key") or get_fallback_anonymization_key(), columns)
+
+# The phone data this session may see: anonymized unless it has high clearance
+def phones_for(worksheets):
+    data_phone = worksheets.get('FullPhones', pd.DataFrame()) # shared by every session: never modify it in place
+    if st.session_state['clearance_level'] != 'high' and not data_phone.empty:
+        with run.profiler.cached('anonymized phones'):
+            data_phone = run.shared_store.get((worksheets.version, 'anonymized_phones'), lambda: build_anonymized_phones(data_phone))
+    return data_phone
+
+# Table sources with per-column indexes, built once per data version (and clearance, since phone usernames differ)
+# Filtering, sorting and paging are answered from these (or from the SQL engine's copy of the worksheet), and only the visible page goes to the browser
+def get_table_source(worksheets, table_id, clearance, data, index_columns, worksheet_name):
+    def build():
+        run.profiler.miss(f'table source {table_id}')
+        if dashboard_page.sql_mode():
+            return dashboard_sql.SqlTableSource(run.sql_engine(worksheets), worksheet_name, data)
+        return dashboard_tables.TableSource(data, index_columns)
+
+    with run.profiler.cached(f'table source {table_id}'):
+        return run.shared_store.get((worksheets.version, table_id, clearance), build)
+
+# Sort and page controls for a table; returns the visible page and the positions of every matching row
+def paged_table(source, key, filters):
+    sort_col, order_col, size_col, page_col = st.columns(4)
+    sort_by = sort_col.selectbox("Sort by:", ['None'] + list(source.data.columns), key=f"{key}_sort")
+    ascending = order_col.radio("Order:", ('Ascending', 'Descending'), key=f"{key}_order") == 'Ascending'
+    page_size = size_col.selectbox("Rows per page:", [25, 50, 100, 250], index=1, key=f"{key}_page_size")
+    with run.profiler.stage(f'table {key} filter'):
+        rows = source.rows(filters, None if sort_by == 'None' else sort_by, ascending)
+    pages = dashboard_tables.page_count(len(rows), page_size)
+    page = page_col.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1, step=1,
+                                 key=f"{key}_page_{pages}") # new widget when the page count changes, so the page resets to 1
+    start = (page - 1) * page_size
+    st.caption(f"Rows {min(start + 1, len(rows))}-{min(start + page_size, len(rows))} of {len(rows)}")
+    page_data = source.take(rows[start:start + page_size])
+    if run.profiler.enabled:
+        run.profiler.payload(f'table {key}', len(page_data.to_json(orient='records'))) # JSON size of the rows sent to the grid
+    return page_data, rows
+
+export_cache = get_export_cache()
+
+# Download button for the rows of a table view. The file is only generated when the button is clicked,
+# chunk by chunk, and cached per (data version, table, matching rows, format)
+def download_button(worksheets, label, source, rows, table_id, file_stem):
+    export_format = st.selectbox("Download format:", list(dashboard_exports.EXPORT_FORMATS), key=f"{table_id}_format")
+    extension, mime = dashboard_exports.EXPORT_FORMATS[export_format]
+    view = (worksheets.version, table_id, st.session_state['clearance_level'], hashlib.sha1(rows.tobytes()).hexdigest())
+    st.download_button(label=f"{label} as {export_format}",
+                    data=lambda: export_cache.get(view, source, rows, export_format),
+                    file_name=f"{file_stem}.{extension}",
+                    mime=mime)
+
+# Phone Data
+def phone_table(worksheets):
+    data_phone = phones_for(worksheets)
+    if data_phone.empty:
+        return
+    phone_source = get_table_source(worksheets, 'phones', st.session_state['clearance_level'], data_phone, ('Location',), 'FullPhones')
+    location_options = ['All'] + phone_source.values('Location')
+    selected_location = st.selectbox("Select Location:", options=location_options)
+
+    # Display the data table (filtered on the selected location)
+    st.write(f"Phone Data for {selected_location}:")
+    page_phone, rows_phone = paged_table(phone_source, 'phone', {'Location': selected_location})
+    with run.profiler.stage('table phone grid'):
+        grid_options = GridOptionsBuilder.from_dataframe(page_phone).build()
+        AgGrid(page_phone, gridOptions=grid_options)
+
+    # Download button for the displayed data
+    download_button(worksheets, "Download Displayed Phone Data", phone_source, rows_phone, 'phone',
+                    f'phone_data_{selected_location.replace(" ", "_")}')
+
+# Server Data
+def server_table(worksheets):
+    data_server = worksheets.get('TechInventory', pd.DataFrame())
+    if data_server.empty:
+        return
+    server_source = get_table_source(worksheets, 'server', None, data_server, ('Section',), 'TechInventory')
+    section_options = ['All'] + server_source.values('Section')
+    selected_section = st.selectbox("Select Section:", options=section_options)
+
+    # Display the data table (filtered on the selected section, dropping 'Combined_Section' if it exists)
+    st.write(f"Server Equipment Data for: {selected_section}")
+    page_server, rows_server = paged_table(server_source, 'server', {'Section': selected_section})
+    data_server_display = page_server.drop(columns=['Combined_Section'], errors='ignore')
+    with run.profiler.stage('table server grid'):
+        grid_options = GridOptionsBuilder.from_dataframe(data_server_display).build()
+        AgGrid(data_server_display, gridOptions=grid_options)
+
+    # Download button for the displayed data
+    # We might as well let them download with Combined_Section but it wasn't worth displaying
+    download_button(worksheets, "Download Displayed Server Data", server_source, rows_server, 'server',
+                    f'server_data_{selected_section.replace(" ", "_")}')
+    
+# Workstation Data - complex two-tier filtering system because there are multiple columns of interest you might want to filter by, and each obviously have categories
+# Tier 1 picks any number of categories, tier 2 any number of values in each. Values within a category are OR'ed and categories are AND'ed,
+# all answered by intersecting the precomputed (category, value) -> rows index
+def workstation_table(worksheets):
+    data_stationary = worksheets.get('StationaryTech', pd.DataFrame())
+    if data_stationary.empty:
+        return
+    filter_categories = ['Department', 'Device', 'Warehouse']
+    stationary_source = get_table_source(worksheets, 'stationary', None, data_stationary, tuple(filter_categories), 'StationaryTech')
+
+    selected_filter_categories = st.multiselect("Select filter categories:", filter_categories)
+
+    filters = {}
+    for category in selected_filter_categories:
+        # option lists are sorted once per data version (alphabetically displayed); leaving one empty means All
+        filters[category] = st.multiselect(f"Select {category}:", stationary_source.options(category)) # only prompt for tier 2 for the categories picked in tier 1
+
+    active_filters = {category: values for category, values in filters.items() if values}
+    if active_filters:
+        display_text = "; ".join(f"{category} - {', '.join(values)}" for category, values in active_filters.items())
+    else:
+        display_text = "All"
+
+    st.write(f"Workstation Device Data for {display_text}:")
+
+    page_stationary, rows_stationary = paged_table(stationary_source, 'stationary', active_filters)
+    with run.profiler.stage('table stationary grid'):
+        st.dataframe(page_stationary)
+
+    file_stem = "_".join(f"{category}_{'_'.join(values)}" for category, values in active_filters.items()) or "all"
+    download_button(worksheets, "Download Displayed Workstation Data", stationary_source, rows_stationary, 'stationary',
+                    f"{file_stem.replace(' ', '_').lower()}_data")
+
+# Interactive Data Tables with Download Buttons
+st.subheader("Explore Data")
+run.show([
+    run.placeholder_section(['FullPhones'], 'phone table', phone_table, "Loading phone data…"),
+    run.placeholder_section(['TechInventory'], 'server table', server_table, "Loading server equipment data…"),
+    run.placeholder_section(['StationaryTech'], 'workstation table', workstation_table, "Loading workstation data…"),
+])
+
+run.footer()
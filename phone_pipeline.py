@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+import AddTechPrices
+from name_index import NameIndex
+import MergePhoneCSV
+import sheets
+
+# Phone data pipeline: merge the inventory with the Verizon plan exports, add estimated prices and push the result
+# to the FullPhones worksheet, in one run:
+#   python phone_pipeline.py --plans confidential/PhonePlans.csv --credentials service_account.json
+# Stages hand DataFrames to each other in memory. Every stage output is cached on disk under the hash of its inputs,
+# so a re-run only redoes the stages (and plan exports) whose inputs changed, and the upload only rewrites changed rows.
+CACHE_DIR = '.pipeline_cache'  # holds phone data - keep it out of git
+PHONE_WORKSHEET = 'FullPhones'
+output_file_path = 'confidential/AllPhoneInfo.csv'
+
+# Bump a stage's version when its code changes, so outputs cached by the old code are not reused
+STAGE_VERSIONS = {
+    'merge': 1,
+    'price': 2,
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Content hash of a DataFrame: its column names and the hash of every row
+def frame_hash(data):
+    digest = hashlib.sha256(json.dumps(list(map(str, data.columns))).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def stage_key(stage, *inputs):
+    return hashlib.sha256(json.dumps([stage, STAGE_VERSIONS[stage], *inputs]).encode()).hexdigest()[:24]
+
+
+# Stage outputs on disk as Parquet files named after the stage key
+class StageCache:
+    def __init__(self, directory=CACHE_DIR, enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        self.hits = []
+        self.misses = []
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    # Return the cached output for these inputs, or build() it and cache it
+    def run(self, stage, inputs, build):
+        key = stage_key(stage, *inputs)
+        if self.enabled and os.path.exists(self.path(key)):
+            self.hits.append(stage)
+            return pd.read_parquet(self.path(key))
+        data = build()
+        os.makedirs(self.directory, exist_ok=True)
+        data.to_parquet(self.path(key) + '.tmp', index=False)
+        os.replace(self.path(key) + '.tmp', self.path(key))
+        self.misses.append(stage)
+        return data
+
+    # Small JSON state next to the cached outputs (e.g. what was last uploaded)
+    def read_state(self, name):
+        try:
+            with open(os.path.join(self.directory, f"{name}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_state(self, name, state):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{name}.json"), 'w') as f:
+            json.dump(state, f)
+
+
+# Stage 1: merge. Each plan export is merged (and cached) on its own, so a change to one month's bill
+# only re-merges that file. Every phone then keeps only its latest bill: its row from the last export that lists it,
+# with the exports given oldest first, so FullPhones holds one row per phone and the dashboard never adds up
+# several months of the same bill. Rows are sorted by number so they keep their place in the sheet between runs.
+def merge_stage(cache, inventory_path, plans_paths, chunk_rows=MergePhoneCSV.CHUNK_ROWS):
+    inventory_hash = file_hash(inventory_path)
+    inventory = MergePhoneCSV.load_inventory(inventory_path)
+    columns = MergePhoneCSV.final_columns + ['Inventory Row']
+    merged = []
+    for plans_path in plans_paths:
+        def build():
+            chunks = list(MergePhoneCSV.merge_chunks(inventory, plans_path, chunk_rows))
+            return pd.concat(chunks)[columns] if chunks else pd.DataFrame(columns=columns)
+        merged.append(cache.run('merge', [inventory_hash, file_hash(plans_path)], build))
+    latest = MergePhoneCSV.latest_bills(merged)
+    matched = np.zeros(len(inventory), dtype=bool)
+    matched[latest['Inventory Row'].to_numpy(dtype=np.intp)] = True
+    data = pd.concat([latest[MergePhoneCSV.final_columns], MergePhoneCSV.unmatched_phones(inventory, matched)])
+    return data.sort_values('Number', kind='stable').reset_index(drop=True)
+
+
+# Stage 2: estimated prices
+def price_stage(cache, merged, prices_path=AddTechPrices.PRICE_TABLE_PATH):
+    def build():
+        price_map = AddTechPrices.load_price_map(prices_path)
+        models = merged['Equipment Model']
+        return merged.assign(**{'Estimated Price': AddTechPrices.estimate_prices(models, price_map, index=NameIndex(models))})
+    return cache.run('price', [frame_hash(merged), file_hash(prices_path)], build)
+
+
+# Worksheet values (a list of possibly ragged rows) as a frame of text cells
+def sheet_cells(rows):
+    return pd.DataFrame(rows).fillna('').astype(str)
+
+
+# A DataFrame as the text cells it fills in the sheet: the header row, then one row per data row
+def data_cells(data):
+    header = pd.DataFrame([list(map(str, data.columns))])
+    body = data.astype(object).fillna('').set_axis(range(data.shape[1]), axis=1)
+    return pd.concat([header, body], ignore_index=True).astype(str)
+
+
+def to_number(text):
+    return pd.to_numeric(text.str.replace(r'[$,]', '', regex=True), errors='coerce')
+
+
+# Ranges to write so the worksheet holding the `current` cells ends up holding the `new` ones: one range per run of
+# consecutive changed rows, plus blank rows over whatever the new data no longer covers.
+# Returns the ranges and the number of changed rows.
+def diff_ranges(current, new):
+    height, width = max(len(current), len(new)), max(current.shape[1], new.shape[1], 1)
+    pad = lambda cells: cells.reindex(index=range(height), columns=range(width), fill_value='').astype(str).apply(lambda column: column.str.strip())
+    current, new = pad(current), pad(new)
+    differs = current != new
+    # Cells whose text differs may still hold the same number ('12.50' in the export, 12.5 in a sheet written before
+    # uploads were RAW), unless it is too long for a double to tell apart (a Device ID that lost its last digits)
+    for column in differs.columns[differs.any()]:
+        rows = differs[column].to_numpy()
+        current_number, new_number = to_number(current.loc[rows, column]), to_number(new.loc[rows, column])
+        same_number = ((current_number == new_number) & (new_number.abs() < 2 ** 53)).to_numpy()
+        differs.loc[rows, column] = ~same_number
+    changed = np.flatnonzero(differs.any(axis=1).to_numpy())
+    ranges = [{'range': f"{rowcol_to_a1(start + 1, 1)}:{rowcol_to_a1(end, width)}",
+               'values': new.iloc[start:end].values.tolist()}
+              for start, end in changed_runs(changed)]
+    return ranges, len(changed)
+
+
+# (start, end) of each run of consecutive row numbers, end exclusive
+def changed_runs(rows):
+    if not len(rows):
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    return list(zip(rows[np.r_[0, breaks]], rows[np.r_[breaks - 1, len(rows) - 1]] + 1))
+
+
+# Stage 3: push to the worksheet, rewriting only the rows that changed, in one batched request
+# Skipped without reading the sheet when this exact output was pushed last and nobody edited the spreadsheet since.
+# Returns the number of rows written.
+def upload_stage(cache, client, data, dry_run=False, spreadsheet_name=sheets.SPREADSHEET_NAME, worksheet_name=PHONE_WORKSHEET):
+    content = frame_hash(data)
+    spreadsheet = client.open(spreadsheet_name)
+    last = cache.read_state('upload') if cache.enabled else None
+    if last and last['content'] == content and last['revision'] == spreadsheet.get_lastUpdateTime():
+        cache.hits.append('upload')
+        return 0
+    worksheet = spreadsheet.worksheet(worksheet_name)
+    new = data_cells(data)
+    # Cells are written RAW, as the exact text of the output (so Device IDs keep all their digits), and read back unformatted
+    ranges, rows = diff_ranges(sheet_cells(worksheet.get_all_values(value_render_option='UNFORMATTED_VALUE')), new)
+    if not dry_run:
+        if len(new) > worksheet.row_count:
+            worksheet.add_rows(len(new) - worksheet.row_count)
+        if new.shape[1] > worksheet.col_count:
+            worksheet.add_cols(new.shape[1] - worksheet.col_count)
+        if ranges:
+            worksheet.batch_update(ranges, value_input_option='RAW')
+        cache.write_state('upload', {'content': content, 'revision': spreadsheet.get_lastUpdateTime()})
+    cache.misses.append('upload')
+    return rows
+
+
+# Run every stage and print what each took and whether it came from the cache
+def run_pipeline(inventory_path, plans_paths, prices_path=AddTechPrices.PRICE_TABLE_PATH, output_path=None,
+                 client=None, cache=None, dry_run=False):
+    cache = cache or StageCache()
+    cache.hits, cache.misses = [], []
+    timings = {}
+
+    start = time.perf_counter()
+    merged = merge_stage(cache, inventory_path, plans_paths)
+    timings['merge'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    priced = price_stage(cache, merged, prices_path)
+    timings['price'] = time.perf_counter() - start
+
+    if output_path:
+        priced.to_csv(output_path, index=False)
+
+    rows = None
+    if client is not None:
+        start = time.perf_counter()
+        rows = upload_stage(cache, client, priced, dry_run=dry_run)
+        timings['upload'] = time.perf_counter() - start
+
+    for stage, seconds in timings.items():
+        cached = f"{cache.hits.count(stage)} cached, {cache.misses.count(stage)} run"
+        print(f"{stage:<8} {seconds:7.3f} s  ({cached})")
+    return priced, rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge phone inventory and plans, add prices and update the FullPhones worksheet")
+    parser.add_argument('--inventory', default=MergePhoneCSV.hh_inventory_path)
+    parser.add_argument('--plans', nargs='+', default=[MergePhoneCSV.vzw_mobile_plans_path], help="plan exports, oldest first (e.g. one per month); each phone keeps its latest bill")
+    parser.add_argument('--prices', default=AddTechPrices.PRICE_TABLE_PATH)
+    parser.add_argument('--output', default=output_file_path, help="also save the result to this CSV file ('' to skip)")
+    parser.add_argument('--credentials', help="service account JSON file; without it nothing is uploaded")
+    parser.add_argument('--dry-run', action='store_true', help="compute the sheet diff without writing it")
+    parser.add_argument('--force', action='store_true', help="ignore cached stage outputs")
+    args = parser.parse_args()
+
+    client = None
+    if args.credentials:
+        import gspread
+        client = gspread.service_account(filename=args.credentials)
+    data, rows = run_pipeline(args.inventory, args.plans, args.prices, args.output or None, client,
+                              StageCache(enabled=not args.force), args.dry_run)
+    print(f"{len(data)} phones" + (f", {rows} rows {'to update' if args.dry_run else 'updated'} in {PHONE_WORKSHEET}" if rows is not None else ''))
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import dashboard_memory
+from gspread.utils import absolute_range_name, fill_gaps, numericise_all, to_records
+
+# Spreadsheet and worksheets read by the Streamlit dashboard
+SPREADSHEET_NAME = "HH Inventory"
+WORKSHEETS = ['TechInventory', 'FullPhones', 'StationaryTech']
+
+# Seconds between two revision checks of the spreadsheet by the shared WorksheetCache
+REFRESH_TTL = 300
+
+logger = logging.getLogger(__name__)
+
+
+# Turn the raw cell values of a worksheet into a DataFrame
+# Mirrors Worksheet.get_all_records: first row is the header, rows are padded with '' and numbers are numericised
+def values_to_dataframe(values):
+    if not values or values == [[]]:
+        return pd.DataFrame()
+    values = fill_gaps(values)
+    header, rows = values[0], values[1:]
+    rows = [numericise_all(row) for row in rows]
+    return pd.DataFrame(to_records(header, rows))
+
+
+# Fetch the raw cell values of several worksheets in one batched values request
+def fetch_values(spreadsheet, worksheet_names):
+    ranges = [absolute_range_name(name) for name in worksheet_names]
+    response = spreadsheet.values_batch_get(ranges)
+    value_ranges = response.get('valueRanges', [])
+    # The API answers in the same order as the requested ranges
+    return {name: value_range.get('values', []) for name, value_range in zip(worksheet_names, value_ranges)}
+
+
+# Load several worksheets at once
+# The spreadsheet is opened a single time and every worksheet comes back in one batched values request,
+# instead of one open + get_all_records round-trip per worksheet
+def load_worksheets(client, worksheet_names=WORKSHEETS, spreadsheet_name=SPREADSHEET_NAME):
+    spreadsheet = client.open(spreadsheet_name)
+    values = fetch_values(spreadsheet, worksheet_names)
+    return {name: values_to_dataframe(values[name]) for name in values}
+
+
+# Fingerprint of a worksheet's raw values, used to tell which worksheets changed between two fetches
+def hash_values(values):
+    return hashlib.sha256(json.dumps(values, default=str).encode()).hexdigest()
+
+
+# Processed worksheets by name, with a version string that changes whenever any of them changes
+# Keeping the version on the dict itself means a reader can never pair new data with an old version.
+# The frames are shared by every session, so they are made read-only: writing into one raises instead of changing it for everyone.
+class WorksheetData(dict):
+    def __init__(self, data=(), hashes=None):
+        super().__init__(data)
+        dashboard_memory.freeze(self)
+        self.version = hash_values(sorted((hashes or {}).items()))[:16]
+
+
+# Process-wide cache of the processed worksheets, shared by every dashboard session
+# At most once per `ttl` seconds it asks Drive for the spreadsheet's modifiedTime (a cheap metadata request).
+# Values are only downloaded when that revision moved, and `process(data, worksheet_name)` only re-runs for worksheets whose values changed
+# (or for every worksheet on a forced refresh, so data processed by older code is never kept).
+# With a SnapshotStore, it starts from the last snapshot on disk and keeps that snapshot up to date.
+class WorksheetCache:
+    def __init__(self, client, process=None, ttl=REFRESH_TTL, worksheet_names=WORKSHEETS,
+                 spreadsheet_name=SPREADSHEET_NAME, clock=time.monotonic, snapshots=None):
+        self.client = client
+        self.process = process if process is not None else (lambda data, worksheet_name: data)
+        self.ttl = ttl
+        self.worksheet_names = list(worksheet_names)
+        self.spreadsheet_name = spreadsheet_name
+        self.clock = clock
+        self.snapshots = snapshots
+        self.spreadsheet = None
+        self.revisions = {}  # worksheet name -> Drive modifiedTime of the spreadsheet when that worksheet was last fetched
+        self.hashes = {}  # worksheet name -> hash of its raw values
+        self.data = WorksheetData()  # worksheet name -> processed DataFrame
+        self.checked_at = None
+        self.last_error = None  # error of the last failed background revalidation
+        self.timings = {}  # seconds spent by the last refresh on each step: 'revision check', 'fetch', 'process <worksheet>'
+        self.lock = threading.Lock()
+        self.loading = False  # True while a refresh is running
+        self.changed = threading.Condition()  # notified whenever self.data is replaced or a refresh ends
+
+        if snapshots is not None:
+            snapshot = snapshots.load()
+            if snapshot is not None:
+                self.revisions, self.hashes, data = snapshot
+                self.data = WorksheetData(data, self.hashes)
+
+    def is_stale(self):
+        return self.checked_at is None or self.clock() - self.checked_at >= self.ttl
+
+    # Return the processed worksheets as a WorksheetData
+    # Without any data (or with force=True) this waits for Sheets. Otherwise stale data is returned right away
+    # and revalidated on a background thread, so no session ever waits on a routine check.
+    # With wait=False, a cache without any data returns right away too and loads the worksheets in the background,
+    # each one published as soon as it is ready (see wait()), so a page can show the first worksheets while the others load.
+    def get(self, force=False, wait=True):
+        if not self.data and not force and not wait:
+            self.load_in_background()
+        elif force or not self.data:
+            with self.lock:
+                if force or not self.data:  # another session may have loaded it while we waited
+                    self.refresh(force=force)
+        elif self.is_stale():
+            self.revalidate_in_background()
+        return self.data
+
+    # Block until the data is no longer `data` (a worksheet arrived) or no refresh is running, at most `timeout` seconds
+    def wait(self, data, timeout=None):
+        with self.changed:
+            self.changed.wait_for(lambda: self.data is not data or not self.loading, timeout)
+            return self.data
+
+    def revalidate_in_background(self):
+        if self.lock.acquire(blocking=False):  # a revalidation is already running otherwise
+            threading.Thread(target=self.revalidate, daemon=True).start()
+
+    # Fetch every worksheet with its own request on worker threads and publish each one as soon as it is processed
+    def load_in_background(self):
+        if self.lock.acquire(blocking=False):  # a load is already running otherwise
+            self.loading = True  # before the thread starts, so no session sees "not loading" and no data
+            threading.Thread(target=self.revalidate, kwargs={'progressive': True}, daemon=True).start()
+
+    def revalidate(self, progressive=False):
+        try:
+            self.refresh(progressive=progressive)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            self.checked_at = self.clock()  # keep serving what we have and try again after the TTL
+        finally:
+            self.lock.release()
+
+    def publish(self, data):
+        with self.changed:
+            self.data = WorksheetData(data, self.hashes)
+            self.changed.notify_all()
+
+    # Check the revision marker and re-fetch/re-process what changed. Returns the names of the changed worksheets.
+    # Callers must hold self.lock.
+    def refresh(self, force=False, progressive=False):
+        with self.changed:
+            self.loading = True
+        try:
+            return self.update(force, progressive)
+        finally:
+            with self.changed:
+                self.loading = False
+                self.changed.notify_all()
+
+    # Worksheets that fail to load keep their old data and revision, so the next refresh fetches only them again;
+    # the others are published and saved before the first error is raised
+    def update(self, force=False, progressive=False):
+        timings = {}
+        start = time.perf_counter()
+        if self.spreadsheet is None:
+            self.spreadsheet = self.client.open(self.spreadsheet_name)
+        revision = self.spreadsheet.get_lastUpdateTime()
+        timings['revision check'] = time.perf_counter() - start
+        names = [name for name in self.worksheet_names if force or name not in self.data or self.revisions.get(name) != revision]
+        if not names:
+            self.checked_at = self.clock()
+            self.timings = timings
+            return []
+
+        data = dict(self.data)  # new dict, so sessions still rendering the previous one are not affected
+        changed, fetched, errors = [], [], []
+        if progressive:
+            with ThreadPoolExecutor(max_workers=len(names)) as pool:
+                futures = {pool.submit(self.fetch_worksheet, name, timings): name for name in names}
+                for future in as_completed(futures):  # processed one at a time in arrival order, so the first is ready soonest
+                    name = futures[future]
+                    try:
+                        self.store(data, changed, name, *self.process_values(name, future.result(), timings, force))
+                    except Exception as e:
+                        errors.append(e)  # the other worksheets are still published and saved
+                        continue
+                    fetched.append(name)
+                    self.publish(data)
+        else:
+            start = time.perf_counter()
+            values = fetch_values(self.spreadsheet, names)
+            timings['fetch'] = time.perf_counter() - start
+            for name in names:
+                self.store(data, changed, name, *self.process_values(name, values.get(name, []), timings, force))
+            fetched = names
+            self.publish(data)
+        for name in fetched:
+            self.revisions[name] = revision
+        self.checked_at = self.clock()
+        if self.snapshots is not None and fetched:
+            start = time.perf_counter()
+            self.save_snapshot(changed)  # also records the new revisions when no worksheet changed
+            timings['save snapshot'] = time.perf_counter() - start
+        self.timings = timings
+        if errors:
+            raise errors[0]
+        return changed
+
+    # Hash the raw values of a worksheet and process them if they changed (or always, with force=True).
+    # Returns the hash and the processed DataFrame, or None if the worksheet did not change.
+    def process_values(self, name, values, timings, force=False):
+        digest = hash_values(values)
+        if not force and name in self.data and digest == self.hashes.get(name):
+            return digest, None
+        start = time.perf_counter()
+        processed = self.process(values_to_dataframe(values), name)
+        timings[f'process {name}'] = time.perf_counter() - start
+        return digest, processed
+
+    # The raw values of one worksheet, fetched with its own values request (runs on a worker thread)
+    def fetch_worksheet(self, name, timings):
+        start = time.perf_counter()
+        values = fetch_values(self.spreadsheet, [name]).get(name, [])
+        timings[f'fetch {name}'] = time.perf_counter() - start
+        return values
+
+    def store(self, data, changed, name, digest, processed):
+        if processed is not None:
+            data[name] = processed
+            self.hashes[name] = digest
+            changed.append(name)
+
+    def save_snapshot(self, names):
+        try:
+            self.snapshots.save(self.revisions, self.hashes, self.data, names=names)
+        except Exception as e:
+            # A snapshot that can't be written must never break the dashboard; the next change retries it
+            logger.warning("Failed to save snapshot: %s", e)
@@ -0,0 +1,172 @@
+import random
+import threading
+import time
+from collections import Counter, deque
+import requests
+from gspread.exceptions import APIError
+
+# Quota-aware wrapper around a gspread client, shared by every dashboard session
+# - identical reads already in flight (same spreadsheet, same method, same arguments) are coalesced: later callers
+#   wait for the first one's answer instead of sending their own request
+# - requests are spaced to stay within the configured quota (Sheets allows 60 read requests per minute per user by default)
+# - requests rejected with 429 (quota) or 5xx (server), or lost to a connection error or timeout, are retried with
+#   jittered exponential backoff
+# Counters of requests sent, retries, coalesced waits and quota waits are kept in `counters`.
+REQUESTS_PER_MINUTE = 60
+MAX_RETRIES = 5
+BACKOFF = 1.0  # seconds before the first retry, doubled for every retry after it
+MAX_BACKOFF = 32.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# HTTP status of an error answer, from the response itself: APIError.code is -1 when the body isn't JSON,
+# as with the HTML error pages of Google's front end
+def status_code(error):
+    return error.response.status_code if isinstance(error, APIError) else None
+
+
+def retryable(error):
+    return isinstance(error, (requests.ConnectionError, requests.Timeout)) or status_code(error) in RETRY_STATUSES
+
+
+# At most `limit` requests in any `period` seconds; acquire() blocks until the next request may go
+class RateLimiter:
+    def __init__(self, limit, period=60.0, clock=time.monotonic, sleep=time.sleep):
+        self.limit = limit
+        self.period = period
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = deque()  # times of the requests of the last period
+        self.lock = threading.Lock()
+
+    # Returns the seconds waited
+    def acquire(self):
+        waited = 0.0
+        with self.lock:  # waiters queue up behind the one sleeping, in arrival order
+            while True:
+                now = self.clock()
+                while self.sent and self.sent[0] <= now - self.period:
+                    self.sent.popleft()
+                if len(self.sent) < self.limit:
+                    self.sent.append(now)
+                    return waited
+                delay = self.sent[0] + self.period - now
+                self.sleep(delay)
+                waited += delay
+
+
+# The answer (or error) of a request in flight, for the callers coalesced into it
+class InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuotaClient:
+    # At most `limit` requests per `period` seconds
+    def __init__(self, client, limit=REQUESTS_PER_MINUTE, period=60.0, max_retries=MAX_RETRIES, backoff=BACKOFF,
+                 max_backoff=MAX_BACKOFF, clock=time.monotonic, sleep=time.sleep, rng=None):
+        self.client = client
+        self.limiter = RateLimiter(limit, period, clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.rng = rng or random.Random()
+        self.in_flight = {}  # request key -> InFlight
+        self.lock = threading.Lock()
+        self.counters = Counter()  # requests, retries, coalesced, throttled, throttled_seconds, failures
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    # Send `request` (a function making one API call) unless an identical one is in flight, then share its answer
+    def call(self, key, request):
+        with self.lock:
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = InFlight()
+            else:
+                self.counters['coalesced'] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self.send(request)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            flight.done.set()
+
+    # Send one request within the quota, retrying 429 and 5xx answers and lost connections after a random wait of up to
+    # backoff * 2^retry seconds (full jitter, so sessions rejected together do not come back together)
+    def send(self, request):
+        for retry in range(self.max_retries + 1):
+            waited = self.limiter.acquire()
+            if waited:
+                self.count('throttled')
+                self.count('throttled_seconds', waited)
+            self.count('requests')
+            try:
+                return request()
+            except (APIError, requests.ConnectionError, requests.Timeout) as e:
+                if not retryable(e) or retry == self.max_retries:
+                    self.count('failures')
+                    raise
+                self.count('retries')
+                self.sleep(self.rng.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry)))
+
+    def open(self, title):
+        return QuotaSpreadsheet(self, self.call(('open', title), lambda: self.client.open(title)))
+
+    # Everything else (e.g. open_by_key, http_client) is the wrapped client's, without quota handling
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+# A spreadsheet whose reads go through the QuotaClient; writes and other attributes are the wrapped spreadsheet's
+class QuotaSpreadsheet:
+    def __init__(self, quota_client, spreadsheet):
+        self.quota_client = quota_client
+        self.spreadsheet = spreadsheet
+
+    def values_batch_get(self, ranges, params=None):
+        key = ('values_batch_get', self.spreadsheet.id, tuple(ranges), tuple(sorted((params or {}).items())))
+        return self.quota_client.call(key, lambda: self.spreadsheet.values_batch_get(ranges, params=params))
+
+    def get_lastUpdateTime(self):
+        return self.quota_client.call(('get_lastUpdateTime', self.spreadsheet.id), self.spreadsheet.get_lastUpdateTime)
+
+    def worksheet(self, title):
+        return QuotaWorksheet(self.quota_client, self.quota_client.call(('worksheet', self.spreadsheet.id, title),
+                                                                        lambda: self.spreadsheet.worksheet(title)))
+
+    def __getattr__(self, name):
+        return getattr(self.spreadsheet, name)
+
+
+# A worksheet whose reads go through the QuotaClient; writes and other attributes are the wrapped worksheet's
+class QuotaWorksheet:
+    def __init__(self, quota_client, worksheet):
+        self.quota_client = quota_client
+        self.worksheet = worksheet
+
+    def get_all_values(self, **kwargs):
+        key = ('get_all_values', self.worksheet.spreadsheet_id, self.worksheet.title, tuple(sorted(kwargs.items())))
+        return self.quota_client.call(key, lambda: self.worksheet.get_all_values(**kwargs))
+
+    def get_all_records(self, **kwargs):
+        key = ('get_all_records', self.worksheet.spreadsheet_id, self.worksheet.title, tuple(sorted(kwargs.items())))
+        return self.quota_client.call(key, lambda: self.worksheet.get_all_records(**kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self.worksheet, name)
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+import pandas as pd
+
+# On-disk snapshots of the processed dashboard worksheets
+# Each worksheet is stored as a Parquet file, next to a manifest.json holding the spreadsheet revision each worksheet
+# was fetched at, the hash of the raw values it was built from and the version of the processing code (dashboard_data.PROCESSING_VERSION).
+# The dashboard starts from these right after a restart, unless they were processed by other code.
+SNAPSHOT_DIR = 'snapshots'  # holds inventory data - keep it out of git
+
+
+# Parquet needs one type per column, but get_all_records gives mixed columns (e.g. numbers with '' for blanks)
+def mixed_columns(data):
+    return [column for column in data.columns
+            if data[column].dtype == object and pd.api.types.infer_dtype(data[column], skipna=True) in ('mixed', 'mixed-integer')]
+
+
+# Store mixed columns as text; blanks and missing values stay missing
+def arrow_safe(data, columns=None):
+    data = data.copy()
+    for column in (mixed_columns(data) if columns is None else columns):
+        data[column] = data[column].where(data[column].isna(), data[column].astype(str))
+    return data
+
+
+class SnapshotStore:
+    # Snapshots saved with another `version` are ignored and overwritten
+    def __init__(self, directory=SNAPSHOT_DIR, version=None):
+        self.directory = directory
+        self.version = version
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    # The manifest of the last snapshot, or None if there is none or it was processed by another version
+    def read_manifest(self):
+        try:
+            with open(self.path('manifest.json')) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get('version') == self.version else None
+
+    # Return (revisions, hashes, data) from the last snapshot, each keyed by worksheet, or None if there is no usable snapshot
+    # Worksheets whose file is missing or unreadable are left out, so they get fetched again
+    def load(self):
+        manifest = self.read_manifest()
+        if not manifest:
+            return None
+        revisions, hashes, data = {}, {}, {}
+        for name, entry in manifest.get('worksheets', {}).items():
+            try:
+                data[name] = pd.read_parquet(self.path(entry['file']))
+            except Exception:
+                continue
+            revisions[name] = entry.get('revision')
+            hashes[name] = entry['hash']
+        if not data:
+            return None
+        return revisions, hashes, data
+
+    # Write the given worksheets, then the manifest with the revision of every worksheet. Every file is written to a
+    # temporary name and renamed into place, so a crash mid-save never leaves a half-written snapshot behind.
+    def save(self, revisions, hashes, data, names=None):
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self.read_manifest() or {'worksheets': {}}
+        for name in (names if names is not None else data):
+            filename = f"{name}.parquet"
+            arrow_safe(data[name]).to_parquet(self.path(filename + '.tmp'), index=False)
+            os.replace(self.path(filename + '.tmp'), self.path(filename))
+            manifest['worksheets'][name] = {'file': filename, 'hash': hashes[name]}
+        for name, entry in manifest['worksheets'].items():
+            entry['revision'] = revisions.get(name)
+        manifest['version'] = self.version
+        manifest['saved_at'] = time.time()
+        with open(self.path('manifest.json.tmp'), 'w') as f:
+            json.dump(manifest, f)
+        os.replace(self.path('manifest.json.tmp'), self.path('manifest.json'))
@@ -0,0 +1,62 @@
+import pandas as pd
+import MergePhoneCSV
+import phone_pipeline
+from fake_gspread import FakeClient
+
+# Tests of the phone pipeline's merge and upload against the local fake
+# Run with: python -m pytest -q test_phone_pipeline.py
+HEADER = ['Number', 'Device ID', 'Total Charges']
+
+
+def cells(rows):
+    return phone_pipeline.sheet_cells([HEADER] + rows)
+
+
+def test_unchanged_cells_give_no_ranges():
+    current = cells([['803.555.0100', '100000000000000', '12.50']])
+    assert phone_pipeline.diff_ranges(current, current.copy()) == ([], 0)
+
+
+def test_one_range_per_run_of_changed_rows():
+    current = cells([[f'803.555.010{i}', '1', '5'] for i in range(5)])
+    new = current.copy()
+    new.iloc[1, 2] = '6'
+    new.iloc[2, 2] = '7'
+    new.iloc[4, 0] = '803.555.0199'
+    ranges, rows = phone_pipeline.diff_ranges(current, new)
+    assert rows == 3
+    assert [r['range'] for r in ranges] == ['A2:C3', 'A5:C5']
+    assert ranges[0]['values'] == [['803.555.0100', '1', '6'], ['803.555.0101', '1', '7']]
+
+
+def test_rows_the_new_data_no_longer_covers_are_blanked():
+    current = cells([['803.555.0100', '1', '5'], ['803.555.0101', '2', '6']])
+    ranges, rows = phone_pipeline.diff_ranges(current, cells([['803.555.0100', '1', '5']]))
+    assert rows == 1
+    assert ranges == [{'range': 'A3:C3', 'values': [['', '', '']]}]
+
+
+# A sheet written before uploads were RAW holds numbers: the same amount is not rewritten, a truncated Device ID is
+def test_cells_holding_the_same_number_are_unchanged():
+    new = cells([['803.555.0100', '123456789012345678', '12.50']])
+    assert phone_pipeline.diff_ranges(cells([['803.555.0100', '123456789012345678', '12.5']]), new) == ([], 0)
+    _, rows = phone_pipeline.diff_ranges(cells([['803.555.0100', '123456789012345680', '12.50']]), new)
+    assert rows == 1
+
+
+def test_upload_keeps_long_device_ids_and_grows_the_grid(tmp_path):
+    data = pd.DataFrame({'Device ID': ['123456789012345678901'], **{f'Column {i}': ['x'] for i in range(30)}})
+    client = FakeClient({phone_pipeline.PHONE_WORKSHEET: []})
+    cache = phone_pipeline.StageCache(str(tmp_path))
+    assert phone_pipeline.upload_stage(cache, client, data) == 2  # header and row, 31 columns in a 26-column grid
+    assert client.worksheets[phone_pipeline.PHONE_WORKSHEET][1][0] == '123456789012345678901'
+
+    client.modified += 1  # someone edited another worksheet: the sheet is read and compared again
+    assert phone_pipeline.upload_stage(cache, client, data) == 0
+
+
+def test_latest_bills_keeps_each_phones_last_row():
+    january = pd.DataFrame({'Inventory Row': [0, 1], 'Total Charges': ['10.00', '20.00']})
+    february = pd.DataFrame({'Inventory Row': [1, 0], 'Total Charges': ['21.00', '11.00']})
+    latest = MergePhoneCSV.latest_bills([january, february]).sort_values('Inventory Row')
+    assert latest['Total Charges'].tolist() == ['11.00', '21.00']
@@ -0,0 +1,134 @@
+import pytest
+import sheets
+import snapshots
+from fake_gspread import FakeClient
+
+# Tests of the shared WorksheetCache against the local fake: what it fetches, processes, publishes and snapshots
+# Run with: python -m pytest -q test_sheets.py
+NAMES = ['TechInventory', 'FullPhones', 'StationaryTech']
+
+
+def fake_worksheets():
+    return {
+        'TechInventory': [['Item', 'Quantity'], ['Laptop', '2']],
+        'FullPhones': [['Number', 'Total Charges'], ['803.555.0100', '12.50']],
+        'StationaryTech': [['Device', 'Department'], ['Printer', 'Finance']],
+    }
+
+
+# process() that records which worksheets it ran for, and fails for the worksheets in `failing` while they are in it
+class RecordingProcess:
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    def __call__(self, data, worksheet_name):
+        if worksheet_name in self.failing:
+            raise ValueError(f"can't process {worksheet_name}")
+        self.calls.append(worksheet_name)
+        return data
+
+
+def worksheet_cache(client, process, **kwargs):
+    return sheets.WorksheetCache(client, process=process, worksheet_names=NAMES, **kwargs)
+
+
+def refresh(cache, **kwargs):
+    with cache.lock:
+        return cache.refresh(**kwargs)
+
+
+def test_progressive_load_publishes_every_worksheet():
+    client = FakeClient(fake_worksheets())
+    process = RecordingProcess()
+    cache = worksheet_cache(client, process)
+    published = []
+    publish = cache.publish
+
+    def record(data):
+        published.append(len(data))
+        publish(data)
+
+    cache.publish = record
+    assert sorted(refresh(cache, progressive=True)) == sorted(NAMES)
+    assert published == [1, 2, 3]  # each worksheet is published as soon as it is processed
+    assert cache.data['TechInventory'].to_dict('records') == [{'Item': 'Laptop', 'Quantity': 2}]
+    assert sorted(process.calls) == sorted(NAMES)
+
+
+def test_unchanged_revision_fetches_nothing():
+    client = FakeClient(fake_worksheets())
+    cache = worksheet_cache(client, RecordingProcess())
+    refresh(cache)
+    requests = client.requests
+    assert refresh(cache) == []
+    assert client.requests == requests + 1  # only the revision check
+
+
+# A failed worksheet keeps its old revision, so the next refresh fetches only it, while the others are published and saved
+def test_partial_failure_publishes_and_saves_the_others(tmp_path):
+    client = FakeClient(fake_worksheets())
+    process = RecordingProcess(failing=['FullPhones'])
+    store = snapshots.SnapshotStore(str(tmp_path))
+    cache = worksheet_cache(client, process, snapshots=store)
+    with pytest.raises(ValueError):
+        refresh(cache, progressive=True)
+    assert set(cache.data) == {'TechInventory', 'StationaryTech'}
+    assert set(cache.revisions) == {'TechInventory', 'StationaryTech'}
+    revisions, hashes, data = store.load()
+    assert set(data) == {'TechInventory', 'StationaryTech'}
+
+    process.failing.clear()
+    process.calls.clear()
+    assert refresh(cache, progressive=True) == ['FullPhones']
+    assert process.calls == ['FullPhones']
+    assert set(store.load()[2]) == set(NAMES)
+
+
+# Every worksheet is fetched again when the spreadsheet changes, but only the one whose values changed is processed
+def test_only_changed_worksheets_are_reprocessed():
+    worksheets = fake_worksheets()
+    client = FakeClient(worksheets)
+    process = RecordingProcess()
+    cache = worksheet_cache(client, process)
+    refresh(cache)
+    version = cache.data.version
+    process.calls.clear()
+    client.update_worksheet('FullPhones', worksheets['FullPhones'] + [['803.555.0101', '8.00']])
+    assert refresh(cache) == ['FullPhones']
+    assert process.calls == ['FullPhones']
+    assert len(cache.data['FullPhones']) == 2
+    assert cache.data.version != version
+    assert len(set(cache.revisions.values())) == 1  # every worksheet was fetched at the new revision
+
+
+def test_forced_refresh_reprocesses_every_worksheet():
+    client = FakeClient(fake_worksheets())
+    process = RecordingProcess()
+    cache = worksheet_cache(client, process)
+    refresh(cache)
+    process.calls.clear()
+    refresh(cache, force=True)
+    assert sorted(process.calls) == sorted(NAMES)
+
+
+def test_starts_from_the_snapshot(tmp_path):
+    client = FakeClient(fake_worksheets())
+    refresh(worksheet_cache(client, RecordingProcess(), snapshots=snapshots.SnapshotStore(str(tmp_path), version='1')))
+
+    process = RecordingProcess()
+    cache = worksheet_cache(client, process, snapshots=snapshots.SnapshotStore(str(tmp_path), version='1'))
+    assert set(cache.data) == set(NAMES)
+    assert refresh(cache) == []  # same revision as the snapshot: nothing fetched or processed
+    assert process.calls == []
+
+
+def test_snapshot_of_another_version_is_ignored(tmp_path):
+    client = FakeClient(fake_worksheets())
+    refresh(worksheet_cache(client, RecordingProcess(), snapshots=snapshots.SnapshotStore(str(tmp_path), version='1')))
+
+    process = RecordingProcess()
+    cache = worksheet_cache(client, process, snapshots=snapshots.SnapshotStore(str(tmp_path), version='2'))
+    assert not cache.data
+    refresh(cache)
+    assert sorted(process.calls) == sorted(NAMES)
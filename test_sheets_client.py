@@ -0,0 +1,184 @@
+import random
+import threading
+import pytest
+import requests
+from gspread.exceptions import APIError
+import sheets
+import sheets_client
+from fake_gspread import FakeClient, api_error
+
+# Tests of the quota-aware Sheets client against the local fake, with its injected failures and quota
+# Run with: python -m pytest -q test_sheets_client.py
+WORKSHEETS = {'TechInventory': [['Item', 'Quantity'], ['Laptop', '2']]}
+RANGES = ['TechInventory']
+
+
+# Clock for both the fake and the client: sleeping only moves the time forward and records the wait
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+# Random source that always picks the longest backoff allowed
+class LongestBackoff:
+    def uniform(self, low, high):
+        return high
+
+
+def quota_client(client, clock, **kwargs):
+    return sheets_client.QuotaClient(client, clock=clock.time, sleep=clock.sleep, rng=kwargs.pop('rng', random.Random(0)), **kwargs)
+
+
+def test_status_code_of_html_error_pages():
+    error = api_error(502, "Bad gateway", html=True)
+    assert error.code == -1  # gspread can't read the code of a non-JSON body
+    assert sheets_client.status_code(error) == 502
+    assert sheets_client.retryable(error)
+
+
+# open() succeeds, then the read fails with a 503 and an HTML 502 before going through
+def test_server_errors_are_retried():
+    clock = FakeClock()
+    client = quota_client(FakeClient(WORKSHEETS, failures=[200, 503, 502]), clock)
+    values = client.open(sheets.SPREADSHEET_NAME).values_batch_get(RANGES)
+    assert values['valueRanges'][0]['values'] == WORKSHEETS['TechInventory']
+    assert client.counters['requests'] == 4
+    assert client.counters['retries'] == 2
+    assert client.counters['failures'] == 0
+    assert len(clock.sleeps) == 2
+
+
+def test_connection_errors_and_timeouts_are_retried():
+    clock = FakeClock()
+    fake = FakeClient(WORKSHEETS, failures=[200, requests.ConnectionError("reset"), requests.Timeout("read timed out")])
+    client = quota_client(fake, clock)
+    client.open(sheets.SPREADSHEET_NAME).values_batch_get(RANGES)
+    assert client.counters['retries'] == 2
+    assert fake.requests == 4
+
+
+def test_client_errors_are_not_retried():
+    clock = FakeClock()
+    client = quota_client(FakeClient(WORKSHEETS, failures=[200, 404]), clock)
+    spreadsheet = client.open(sheets.SPREADSHEET_NAME)
+    with pytest.raises(APIError):
+        spreadsheet.values_batch_get(RANGES)
+    assert client.counters['retries'] == 0
+    assert client.counters['failures'] == 1
+    assert clock.sleeps == []
+
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    fake = FakeClient(WORKSHEETS, failures=[200] + [503] * 4)
+    client = quota_client(fake, clock, max_retries=2)
+    spreadsheet = client.open(sheets.SPREADSHEET_NAME)
+    with pytest.raises(APIError):
+        spreadsheet.values_batch_get(RANGES)
+    assert fake.requests == 4  # open, then the first try and 2 retries
+    assert client.counters['retries'] == 2
+    assert client.counters['failures'] == 1
+
+
+# The longest wait doubles with every retry, up to max_backoff
+def test_backoff_doubles_up_to_the_cap():
+    clock = FakeClock()
+    client = quota_client(FakeClient(WORKSHEETS, failures=[200] + [503] * 6), clock,
+                          max_retries=6, backoff=1.0, max_backoff=8.0, rng=LongestBackoff())
+    client.open(sheets.SPREADSHEET_NAME).values_batch_get(RANGES)
+    assert clock.sleeps == [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+
+
+def test_backoff_is_jittered():
+    clock = FakeClock()
+    client = quota_client(FakeClient(WORKSHEETS, failures=[200] + [503] * 5), clock, max_retries=5, backoff=1.0)
+    client.open(sheets.SPREADSHEET_NAME).values_batch_get(RANGES)
+    assert all(0 <= wait <= 2 ** retry for retry, wait in enumerate(clock.sleeps))
+    assert len(set(clock.sleeps)) == len(clock.sleeps)
+
+
+# Sessions asking for the same worksheet while the first request is still out all get its answer
+def test_identical_reads_in_flight_share_one_request():
+    fake = FakeClient(WORKSHEETS, latency=0.3)
+    client = sheets_client.QuotaClient(fake)
+    spreadsheet = client.open(sheets.SPREADSHEET_NAME)
+    sessions = 8
+    start = threading.Barrier(sessions)
+    results = [None] * sessions
+
+    def session(i):
+        start.wait()
+        results[i] = spreadsheet.values_batch_get(RANGES)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake.requests == 2  # open, then a single values request
+    assert client.counters['coalesced'] == sessions - 1
+    assert all(result == results[0] for result in results)
+
+
+def test_coalesced_reads_share_the_error():
+    fake = FakeClient(WORKSHEETS, latency=0.3, failures=[200, 404])
+    client = sheets_client.QuotaClient(fake)
+    spreadsheet = client.open(sheets.SPREADSHEET_NAME)
+    sessions = 4
+    start = threading.Barrier(sessions)
+    errors = []
+
+    def session():
+        start.wait()
+        try:
+            spreadsheet.values_batch_get(RANGES)
+        except APIError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == sessions
+    assert fake.requests == 2
+
+
+# Distinct reads (so nothing is coalesced) against a fake allowing 5 requests per second
+def test_rate_limit_stays_within_the_quota():
+    clock = FakeClock()
+    bare = FakeClient(WORKSHEETS, quota=(5, 1.0), clock=clock.time)
+    spreadsheet = bare.open(sheets.SPREADSHEET_NAME)
+    with pytest.raises(APIError):
+        for i in range(10):
+            spreadsheet.values_batch_get(RANGES, params={'request': i})
+
+    fake = FakeClient(WORKSHEETS, quota=(5, 1.0), clock=clock.time)
+    client = quota_client(fake, clock, limit=5, period=1.0)
+    spreadsheet = client.open(sheets.SPREADSHEET_NAME)
+    for i in range(10):
+        spreadsheet.values_batch_get(RANGES, params={'request': i})
+    assert fake.rejected == 0
+    assert client.counters['throttled'] > 0
+    assert client.counters['retries'] == 0
+
+
+# A client configured above the real quota still gets every answer, retrying the 429s
+def test_quota_rejections_are_retried():
+    clock = FakeClock()
+    fake = FakeClient(WORKSHEETS, quota=(5, 1.0), clock=clock.time)
+    client = quota_client(fake, clock, limit=100, period=1.0)
+    spreadsheet = client.open(sheets.SPREADSHEET_NAME)
+    for i in range(10):
+        spreadsheet.values_batch_get(RANGES, params={'request': i})
+    assert fake.rejected > 0
+    assert client.counters['retries'] == fake.rejected
+    assert client.counters['failures'] == 0